@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Compare items/sec of cheap transforms with and without batches
+
+Usage: python benchmarks/batch_sections.py [size]
+"""
+from __future__ import unicode_literals
+
+import sys
+
+from utils import report
+from utils import run
+
+
+PIPELINE = """
+[transmogrifier]
+batch_size = {batch_size:d}
+pipeline =
+    source
+    delete
+    wrap
+    unwrap
+    codec
+    delete2
+
+[source]
+blueprint = transmogrifier.from
+expression = ({{'id': i, 'title': 'Item %d' % i, 'extra': i}}
+              for i in range({size:d}))
+
+[delete]
+blueprint = transmogrifier.del
+keys = extra
+
+[wrap]
+blueprint = transmogrifier.wrap
+key = wrapped
+
+[unwrap]
+blueprint = transmogrifier.del
+keys = missing
+
+[codec]
+blueprint = transmogrifier.codec
+title = unicode:utf-8
+
+[delete2]
+blueprint = transmogrifier.del
+keys = missing
+"""
+
+
+def main(size=500000):
+    for batch_size in [0, 10, 100, 1000]:
+        seconds = run(PIPELINE.format(batch_size=batch_size, size=size))
+        report('batch_size = {0:d}'.format(batch_size), size, seconds)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Compare transmogrifier.to_csv and transmogrifier.from_csv throughput
+with uncompressed and compressed files
+
+Usage: python benchmarks/csv_compression.py [size]
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from transmogrifier import Transmogrifier
+from transmogrifier.blueprints.data import CSVConstructor
+from transmogrifier.blueprints.data import CSVSource
+
+
+def items(size):
+    for i in range(size):
+        yield {'id': i, 'title': 'Item {0:d}'.format(i),
+               'description': 'Description of item {0:d}'.format(i),
+               'owner': 'user{0:d}'.format(i % 100)}
+
+
+def main(size=200000):
+    transmogrifier = Transmogrifier({})
+    tempdir = tempfile.mkdtemp()
+    try:
+        for extension in ['', '.gz', '.bz2', '.xz']:
+            path = os.path.join(tempdir, 'benchmark.csv' + extension)
+
+            start = time.time()
+            for item in CSVConstructor(transmogrifier, 'constructor',
+                                       {'filename': path,
+                                        'compression_level': '6'},
+                                       items(size)):
+                pass
+            write = time.time() - start
+
+            start = time.time()
+            for item in CSVSource(transmogrifier, 'source', {'filename': path},
+                                  iter(())):
+                pass
+            read = time.time() - start
+
+            print('{0:12s} {1:8.1f} MB {2:10.0f} items/sec written '
+                  '{3:10.0f} items/sec read'.format(
+                      extension or 'none', os.path.getsize(path) / 2. ** 20,
+                      size / write, size / read))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
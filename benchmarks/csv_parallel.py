@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Compare sequential and parallel transmogrifier.from_csv on a generated
+CSV file of the given size in megabytes
+
+Usage: python benchmarks/csv_parallel.py [megabytes] [workers]
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from transmogrifier.blueprints.data import CSVSource
+
+
+def generate(path, megabytes):
+    size = megabytes * 2 ** 20
+    rows = 0
+    with io.open(path, 'w', newline='', encoding='utf-8') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(['id', 'title', 'description', 'owner'])
+        while fp.tell() < size:
+            for i in range(rows, rows + 10000):
+                writer.writerow([
+                    i, 'Item {0:d}'.format(i),
+                    'Description with "quotes",\nnewlines and commas',
+                    'user{0:d}'.format(i % 100)])
+            rows += 10000
+    return rows
+
+
+def parse(path, **options):
+    options['filename'] = path
+    start = time.time()
+    for row in CSVSource(None, 'source', options, iter(())):
+        pass
+    return time.time() - start
+
+
+def main(megabytes=2048, workers=4):
+    tempdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tempdir, 'benchmark.csv')
+        rows = generate(path, megabytes)
+        print('{0:d} MB, {1:d} rows'.format(megabytes, rows))
+        for title, options in [
+                ('sequential', {}),
+                ('workers = {0:d}'.format(workers),
+                 {'workers': str(workers)}),
+                ('workers = {0:d}, ordered = false'.format(workers),
+                 {'workers': str(workers), 'ordered': 'false'})]:
+            seconds = parse(path, **options)
+            print('{0:40s} {1:8.1f} MB/sec {2:12.0f} rows/sec'.format(
+                title, megabytes / seconds, rows / seconds))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Compare a 10-section pipeline with folded default conditions against
+the same pipeline with equivalent, but evaluated conditions
+
+Usage: python benchmarks/default_conditions.py [size]
+"""
+from __future__ import unicode_literals
+
+import sys
+
+from utils import report
+from utils import run
+
+
+PIPELINE = """
+[transmogrifier]
+pipeline =
+    source
+    del1
+    del2
+    del3
+    del4
+    wrap
+    invert
+    transform1
+    transform2
+    codec
+
+[source]
+blueprint = transmogrifier.from
+expression = ({{'id': i}} for i in range({size:d}))
+
+[del1]
+blueprint = transmogrifier.del
+keys = a
+{condition:s}
+
+[del2]
+blueprint = transmogrifier.del
+keys = b
+{condition:s}
+
+[del3]
+blueprint = transmogrifier.del
+keys = c
+{condition:s}
+
+[del4]
+blueprint = transmogrifier.del
+keys = d
+{condition:s}
+
+[wrap]
+blueprint = transmogrifier.wrap
+key = wrapped
+{condition:s}
+
+[invert]
+blueprint = transmogrifier.invert
+key = wrapped
+{condition:s}
+
+[transform1]
+blueprint = transmogrifier.transform
+expression = nothing
+{condition:s}
+
+[transform2]
+blueprint = transmogrifier.transform
+expression = nothing
+{condition:s}
+
+[codec]
+blueprint = transmogrifier.codec
+{condition:s}
+"""
+
+
+def main(size=100000):
+    for title, condition in [
+            ('evaluated condition (python:bool(1))',
+             'condition = python:bool(1)'),
+            ('default condition (folded)', '')]:
+        seconds = run(PIPELINE.format(condition=condition, size=size))
+        report(title, size, seconds)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Compare items/sec of the Chameleon and native expression engines
+
+Usage: python benchmarks/expression_engines.py [size]
+"""
+from __future__ import unicode_literals
+
+import sys
+
+from utils import report
+from utils import run
+
+
+PIPELINE = """
+[transmogrifier]
+expression_engine = {engine:s}
+pipeline =
+    source
+    transform
+    filter
+    filter_or
+    condition
+
+[source]
+blueprint = transmogrifier.from
+expression = ({{'id': i, 'title': 'Item %d' % i}} for i in range({size:d}))
+
+[transform]
+blueprint = transmogrifier.transform
+expression = python:item.update(double=item['id'] * 2)
+
+[filter]
+blueprint = transmogrifier.filter
+is_positive = python:item['id'] >= 0
+
+[filter_or]
+blueprint = transmogrifier.filter.or
+is_even = python:item['double'] % 2 == 0
+is_odd = python:item['double'] % 2 == 1
+
+[condition]
+blueprint = transmogrifier.del
+condition = python:item['id'] % 3 == 0
+keys = double
+"""
+
+
+def main(size=100000):
+    for engine in ['chameleon', 'native']:
+        seconds = run(PIPELINE.format(engine=engine, size=size))
+        report('expression_engine = {0:s}'.format(engine), size, seconds)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
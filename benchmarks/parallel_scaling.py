@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Compare items/sec of a CPU bound transform with transmogrifier.parallel
+using an increasing number of workers
+
+Usage: python benchmarks/parallel_scaling.py [size] [max_workers]
+"""
+from __future__ import unicode_literals
+
+import sys
+
+from utils import report
+from utils import run
+
+
+PIPELINE = """
+[transmogrifier]
+pipeline =
+    source
+    parallel
+
+[source]
+blueprint = transmogrifier.from
+expression = ({{'id': i, 'text': 'Lorem ipsum dolor sit amet ' * 20}}
+              for i in range({size:d}))
+
+[parallel]
+blueprint = transmogrifier.parallel
+workers = {workers:d}
+chunk_size = 100
+pipeline =
+    cleanup
+    checksum
+
+[cleanup]
+blueprint = transmogrifier.set
+text = ' '.join(sorted(set(w.strip().lower() for w in item['text'].split())))
+
+[checksum]
+blueprint = transmogrifier.set
+checksum = sum(sum(ord(c) * n for c in item['text']) for n in range(50))
+"""
+
+
+def main(size=20000, max_workers=4):
+    sequential = run(PIPELINE.replace('blueprint = transmogrifier.parallel',
+                                      'blueprint = transmogrifier.pipeline')
+                     .format(size=size, workers=1))
+    report('sequential', size, sequential)
+    workers = 1
+    while workers <= max_workers:
+        seconds = run(PIPELINE.format(size=size, workers=workers))
+        report('workers = {0:d} (speedup {1:.2f}x)'.format(
+            workers, sequential / seconds), size, seconds)
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
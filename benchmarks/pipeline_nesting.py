@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Compare items/sec of the same sections wrapped in increasingly deeply
+nested pipeline sections
+
+Usage: python benchmarks/pipeline_nesting.py [size] [depth]
+"""
+from __future__ import unicode_literals
+
+import sys
+
+from utils import report
+from utils import run
+
+
+PIPELINE = """
+[transmogrifier]
+expression_engine = native
+pipeline =
+    source
+    {first:s}
+
+[source]
+blueprint = transmogrifier.from
+expression = ({{'id': i}} for i in range({size:d}))
+
+[set]
+blueprint = transmogrifier.set
+title = item['id']
+"""
+
+NESTED = """
+[pipeline{0:d}]
+blueprint = transmogrifier.pipeline
+pipeline =
+    {1:s}
+"""
+
+
+def main(size=200000, depth=4):
+    for depth_ in range(depth + 1):
+        configuration = ''
+        first = 'set'
+        for i in reversed(range(depth_)):
+            configuration += NESTED.format(i, first)
+            first = 'pipeline{0:d}'.format(i)
+        seconds = run(PIPELINE.format(first=first, size=size) + configuration)
+        report('depth = {0:d}'.format(depth_), size, seconds)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Compare items/sec of a long chain of simple transforms with and without
+section fusion
+
+Usage: python benchmarks/section_fusion.py [size] [sections]
+"""
+from __future__ import unicode_literals
+
+import sys
+
+from utils import report
+from utils import run
+
+
+PIPELINE = """
+[transmogrifier]
+fusion = {fusion:s}
+expression_engine = native
+pipeline =
+    source
+{sections:s}
+
+[source]
+blueprint = transmogrifier.from
+expression = ({{'id': i, 'title': 'Item %d' % i}} for i in range({size:d}))
+"""
+
+SECTIONS = [
+    """
+[set{0:d}]
+blueprint = transmogrifier.set
+value{0:d} = item['id']
+""",
+    """
+[del{0:d}]
+blueprint = transmogrifier.del
+keys = value{1:d}
+""",
+    """
+[filter{0:d}]
+blueprint = transmogrifier.filter
+positive = item['id'] >= 0
+""",
+]
+
+
+def main(size=200000, sections=15):
+    names = []
+    configuration = ''
+    for i in range(sections):
+        template = SECTIONS[i % len(SECTIONS)]
+        names.append(template.split(']')[0].strip()[1:].format(i))
+        configuration += template.format(i, i - 1)
+    for fusion in ['false', 'true']:
+        seconds = run(PIPELINE.format(
+            fusion=fusion, size=size,
+            sections='\n'.join(['    ' + name for name in names]))
+            + configuration)
+        report('fusion = {0:s}'.format(fusion), size, seconds)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
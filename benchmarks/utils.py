@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import timeit
+
+from transmogrifier import Transmogrifier
+from transmogrifier.testing import TransmogrifierLayer
+
+
+def run(configuration, repeat=3):
+    """Run the pipeline configuration and return the best time in seconds
+    """
+    TransmogrifierLayer.testSetUp()
+    try:
+        TransmogrifierLayer.registerConfiguration('benchmark', configuration)
+        return min(timeit.repeat(lambda: Transmogrifier({})('benchmark'),
+                                 number=1, repeat=repeat))
+    finally:
+        TransmogrifierLayer.testTearDown()
+
+
+def report(title, size, seconds):
+    print('{0:40s} {1:12.0f} items/sec'.format(title, size / seconds))
@@ -1,16 +1,27 @@
 # -*- coding: utf-8 -*-
+import logging
+
 from zope.component import adapter
 
 from zope.interface import implementer
 from zope.interface import Interface
 
 from future.moves.collections import UserDict
+from six.moves import map
 
+from transmogrifier.checkpoint import get_checkpoint
 from transmogrifier.interfaces import ITransmogrifier
 from transmogrifier.options import Options
+from transmogrifier.stats import get_report
+from transmogrifier.stats import log_report
+from transmogrifier.tracing import log_report as log_trace_report
 from transmogrifier.utils import load_config
 from transmogrifier.utils import get_lines
 from transmogrifier.utils import constructPipeline
+from transmogrifier.utils import plan_pipeline
+
+
+logger = logging.getLogger('transmogrifier')
 
 
 @implementer(ITransmogrifier)
@@ -22,20 +33,73 @@ class Transmogrifier(UserDict):
         self.context = context
         self._data = {}
         self.data = {}
+        self.event_loop = None  # started for asynchronous sections
+        self.meters = []  # section meters when statistics are enabled
+        self.stats = None  # statistics report of the latest run
+        self.tracer = None  # item tracer when tracing is enabled
+        self.trace = None  # tracing report of the latest run
+        self.checkpoint = None  # progress of the run when checkpointing
+        self.consumers = []  # sections notified of the consumed items
 
     def __call__(self, configuration_id, **overrides):
         self.configuration_id = configuration_id
         self._data = load_config(configuration_id, **overrides)
         self.data = {}
 
+        self.meters = []
+        self.stats = None
+        self.tracer = None
+        self.trace = None
+        self.consumers = []
+        self.checkpoint = get_checkpoint(self)
+        if self.checkpoint is not None and self.checkpoint.complete:
+            logger.info('{0:s} already complete'.format(configuration_id))
+            return
+
         options = self._data['transmogrifier']
         sections = get_lines(options['pipeline'])
         pipeline = constructPipeline(self, sections)
+        for consumer in self.consumers:
+            pipeline = map(consumer.consume, pipeline)
 
         # Pipeline execution
         # noinspection PyUnusedLocal
-        for item in pipeline:
-            pass  # discard once processed
+        try:
+            if self.checkpoint is None:
+                for item in pipeline:
+                    pass  # discard once processed
+            else:
+                self.checkpoint.drain(pipeline)
+            if self.meters:
+                self.stats = get_report(self)
+                log_report(self.stats)
+            if self.tracer is not None:
+                self.trace = self.tracer.get_report()
+                log_trace_report(configuration_id, self.trace)
+        finally:
+            for consumer in self.consumers:
+                consumer.finish()
+            if self.event_loop is not None:
+                self.event_loop.close()
+                self.event_loop = None
+
+    def plan(self, configuration_id, **overrides):
+        """Load the named pipeline configuration and return its plan
+
+        The plan lists the groups of (section_id, blueprint_id) of the
+        pipeline, where each group of more than one section is constructed as
+        a single fused section.
+
+        """
+        self.configuration_id = configuration_id
+        self._data = load_config(configuration_id, **overrides)
+        self.data = {}
+
+        options = self._data['transmogrifier']
+        sections = get_lines(options['pipeline'])
+        return [[(section_id, blueprint_id)
+                 for section_id, blueprint_id, blueprint in group]
+                for group in plan_pipeline(self, sections)]
 
     def __getitem__(self, section):
         try:
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Support for asynchronous pipeline sections
+
+Requires Python 3.6 or later for asynchronous generators. This module is
+imported only when a pipeline contains an asynchronous section.
+
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import asyncio
+import threading
+
+from zope.interface import implementer
+from zope.interface import provider
+
+from transmogrifier.condition import Condition
+from transmogrifier.interfaces import IAsyncSection
+from transmogrifier.interfaces import ISectionBlueprint
+
+
+class EventLoop(object):
+    """Event loop for the asynchronous sections in a background thread
+
+    Running the loop in its own thread allows synchronous sections to pull
+    items from asynchronous sections by simply waiting for the results.
+
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run,
+                                       name='transmogrifier:asyncio')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call(self, coroutine):
+        """Run coroutine in the loop and return its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        try:
+            self.call(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+
+def get_event_loop(transmogrifier):
+    """Return the event loop of the transmogrifier, starting it when needed
+    """
+    loop = getattr(transmogrifier, 'event_loop', None)
+    if loop is None:
+        loop = transmogrifier.event_loop = EventLoop()
+    return loop
+
+
+async def next_item(iterator):
+    # StopAsyncIteration cannot be passed through concurrent futures
+    try:
+        return True, await iterator.__anext__()
+    except StopAsyncIteration:
+        return False, None
+
+
+class SyncIterator(object):
+    """Iterate asynchronous section from synchronous sections"""
+
+    def __init__(self, section, loop):
+        self.section = section
+        self.loop = loop
+        self.iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.iterator is None:
+            self.iterator = self.section.__aiter__()
+        success, item = self.loop.call(next_item(self.iterator))
+        if not success:
+            raise StopIteration
+        return item
+
+
+_marker = object()
+
+# Python 3.6 has no get_running_loop, but get_event_loop returns the loop of
+# the running coroutine
+get_running_loop = getattr(asyncio, 'get_running_loop',
+                           asyncio.get_event_loop)
+
+
+async def aiterate(iterable):
+    """Iterate the previous section asynchronously
+
+    Asynchronous sections are iterated directly in the event loop.
+    Synchronous sections are iterated in an executor of a single thread of
+    their own, because they may block or wait for items from asynchronous
+    sections, and may not expect to be resumed in another thread.
+
+    """
+    if isinstance(iterable, SyncIterator) and iterable.iterator is None:
+        async for item in iterable.section:
+            yield item
+    else:
+        loop = get_running_loop()
+        executor = ThreadPoolExecutor(1, 'transmogrifier:aiterate')
+        try:
+            iterator = iter(iterable)
+            while True:
+                item = await loop.run_in_executor(
+                    executor, next, iterator, _marker)
+                if item is _marker:
+                    break
+                yield item
+        finally:
+            executor.shutdown(wait=False)
+
+
+async def imap(function, items, concurrency):
+    """Yield results of coroutine function(item) for asynchronous items
+
+    Up to ``concurrency`` calls are kept in flight at once, but the results
+    are yielded in the order of the items.
+
+    """
+    pending = deque()
+    try:
+        async for item in items:
+            pending.append(asyncio.ensure_future(function(item)))
+            if len(pending) >= concurrency:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+@provider(ISectionBlueprint)
+@implementer(IAsyncSection)
+class AsyncBlueprint(object):
+
+    def __init__(self, transmogrifier, name, options, previous):
+        self.transmogrifier = transmogrifier
+        self.name = name
+        self.options = options
+        self.previous = previous
+
+    def __aiter__(self):
+        raise NotImplementedError('__aiter__')
+
+
+@provider(ISectionBlueprint)
+@implementer(IAsyncSection)
+class AsyncConditionalBlueprint(AsyncBlueprint):
+
+    def __init__(self, transmogrifier, name, options, previous):
+        super(AsyncConditionalBlueprint, self).__init__(
+            transmogrifier, name, options, previous)
+
+        self.condition = Condition(
+            options.get('condition', 'python:True'),
+            transmogrifier, name, options
+        )
+
+    def __aiter__(self):
+        raise NotImplementedError('__aiter__')
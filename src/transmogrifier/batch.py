@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from itertools import chain
+from itertools import islice
+
+from zope.interface import implementer
+
+from transmogrifier.expression import get_option
+from transmogrifier.interfaces import ISection
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.utils import overrides_iter
+
+
+def get_batch_size(transmogrifier):
+    """Return the batch size configured for the transmogrifier
+
+    The size is configured with ``batch_size`` option in the
+    ``[transmogrifier]`` section. Batching is disabled by default or when the
+    size is 1 or less.
+
+    """
+    return int(get_option(transmogrifier, 'batch_size', '0'))
+
+
+def chunked(items, size):
+    """Yield lists of up to size items"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            break
+        yield batch
+
+
+def is_batch_section(section):
+    """Test if the section can be iterated in batches
+
+    Batch sections, whose ``__iter__`` is overridden without overriding
+    ``iter_batches``, are iterated only as items, because their batches would
+    skip the overriding ``__iter__``.
+
+    """
+    return (ISectionBatch.providedBy(section) and
+            not overrides_iter(type(section), 'iter_batches'))
+
+
+def iter_batches(previous, size):
+    """Iterate the previous section in batches
+
+    Batches of batch sections are passed as such. Items of other sections are
+    collected into batches of the given size.
+
+    """
+    if is_batch_section(previous):
+        return previous.iter_batches()
+    return chunked(previous, size)
+
+
+@implementer(ISection, ISectionBatch)
+class BatchIterator(object):
+    """Iterate batch section as items or as batches
+
+    The next section may either iterate the items of the batches or, when it
+    is also a batch section, the batches directly.
+
+    """
+
+    def __init__(self, section):
+        self.section = section
+        self.batches = section.iter_batches()
+        self.items = chain.from_iterable(self.batches)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.items)
+
+    next = __next__  # Python 2
+
+    def iter_batches(self):
+        return self.batches
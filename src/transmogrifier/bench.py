@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from fnmatch import fnmatch
+from itertools import count
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import timeit
+
+from future.moves.collections import OrderedDict
+from six import text_type
+
+from transmogrifier.adapters import Transmogrifier
+from transmogrifier.registry import configuration_registry
+
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 10.0  # percent
+
+PIPELINE = """\
+[transmogrifier]
+pipeline =
+{pipeline:s}
+
+[source]
+blueprint = transmogrifier.from
+expression = python:({{'id': i,
+                       'title': 'Item %d' % i,
+                       'description': 'Description of item %d' % i,
+                       'owner': 'user%d' % (i % 100)}}
+                      for i in range({size:d}))
+"""
+
+CSV_SOURCE = """
+[csv_source]
+blueprint = transmogrifier.from_csv
+filename = {tempdir:s}/input-{size:d}.csv
+"""
+
+JSONL_SOURCE = """
+[jsonl_source]
+blueprint = transmogrifier.from_jsonl
+filename = {tempdir:s}/input-{size:d}.jsonl
+"""
+
+SETUP = """
+[csv]
+blueprint = transmogrifier.to_csv
+filename = {tempdir:s}/input-{size:d}.csv
+
+[jsonl]
+blueprint = transmogrifier.to_jsonl
+filename = {tempdir:s}/input-{size:d}.jsonl
+"""
+
+SET = """
+[set{0:d}]
+blueprint = transmogrifier.set
+title{0:d} = python:item['title'].upper()
+"""
+
+FILTER = """
+[filter{0:d}]
+blueprint = transmogrifier.filter
+positive = python:item['id'] >= 0
+"""
+
+NESTED = """
+[pipeline{0:d}]
+blueprint = transmogrifier.pipeline
+pipeline =
+    {1:s}
+"""
+
+
+def expression_chain(length):
+    sections = ''.join([(SET if i % 2 == 0 else FILTER).format(i)
+                        for i in range(length)])
+    pipeline = [('set{0:d}' if i % 2 == 0 else 'filter{0:d}').format(i)
+                for i in range(length)]
+    return ['source'] + pipeline, sections
+
+
+def nested_pipelines(depth):
+    pipeline, sections = expression_chain(4)
+    sections += NESTED.format(depth - 1, '\n    '.join(pipeline[1:]))
+    for i in reversed(range(depth - 1)):
+        sections += NESTED.format(i, 'pipeline{0:d}'.format(i + 1))
+    return ['source', 'pipeline0'], sections
+
+
+# name: (pipeline section ids, section definitions)
+BENCHMARKS = OrderedDict([
+    ('blueprint.from', (['source'], '')),
+    ('blueprint.set', (['source', 'set'], """
+[set]
+blueprint = transmogrifier.set
+title = python:item['title'].upper()
+""")),
+    ('blueprint.transform', (['source', 'transform'], """
+[transform]
+blueprint = transmogrifier.transform
+expression = python:item.update({'modified': True})
+""")),
+    ('blueprint.filter', (['source', 'filter'], """
+[filter]
+blueprint = transmogrifier.filter
+even = python:item['id'] % 2 == 0
+""")),
+    ('blueprint.filter.and', (['source', 'filter'], """
+[filter]
+blueprint = transmogrifier.filter.and
+even = python:item['id'] % 2 == 0
+owner = python:item['owner'] != 'user1'
+""")),
+    ('blueprint.filter.or', (['source', 'filter'], """
+[filter]
+blueprint = transmogrifier.filter.or
+even = python:item['id'] % 2 == 0
+owner = python:item['owner'] == 'user1'
+""")),
+    ('blueprint.interval', (['source', 'interval'], """
+[interval]
+blueprint = transmogrifier.interval
+interval = 100
+count = python:None
+""")),
+    ('blueprint.del', (['source', 'del'], """
+[del]
+blueprint = transmogrifier.del
+keys = description owner
+""")),
+    ('blueprint.wrap', (['source', 'wrap'], """
+[wrap]
+blueprint = transmogrifier.wrap
+key = wrapped
+""")),
+    ('blueprint.invert', (['source', 'wrap', 'invert'], """
+[wrap]
+blueprint = transmogrifier.wrap
+key = wrapped
+
+[invert]
+blueprint = transmogrifier.invert
+key = wrapped
+""")),
+    ('blueprint.codec', (['source', 'codec'], """
+[codec]
+blueprint = transmogrifier.codec
+title = unicode:utf-8
+""")),
+    ('blueprint.logger', (['source', 'logger'], """
+[logger]
+blueprint = transmogrifier.logger
+name = transmogrifier.bench
+level = DEBUG
+""")),
+    ('blueprint.breakpoint', (['source', 'breakpoint'], """
+[breakpoint]
+blueprint = transmogrifier.breakpoint
+condition = python:item['id'] < 0
+""")),
+    ('blueprint.pipeline', (['source', 'pipeline'], """
+[pipeline]
+blueprint = transmogrifier.pipeline
+pipeline =
+    set
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['title'].upper()
+""")),
+    ('blueprint.prefetch', (['source', 'prefetch', 'set'], """
+[prefetch]
+blueprint = transmogrifier.prefetch
+size = 100
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['title'].upper()
+""")),
+    ('blueprint.parallel', (['source', 'parallel'], """
+[parallel]
+blueprint = transmogrifier.parallel
+workers = 2
+chunk_size = 100
+pipeline =
+    set
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['title'].upper()
+""")),
+    ('blueprint.to_csv', (['source', 'csv'], """
+[csv]
+blueprint = transmogrifier.to_csv
+filename = {tempdir:s}/output.csv
+""")),
+    ('blueprint.to_jsonl', (['source', 'jsonl'], """
+[jsonl]
+blueprint = transmogrifier.to_jsonl
+filename = {tempdir:s}/output.jsonl
+""")),
+    ('blueprint.from_csv', (['csv_source'], CSV_SOURCE)),
+    ('blueprint.from_jsonl', (['jsonl_source'], JSONL_SOURCE)),
+    ('blueprint.generate', (['generate'], """
+[generate]
+blueprint = transmogrifier.generate
+count = {size:d}
+fields =
+    id = sequence
+    title = text 10-40
+    description = text 20-80
+    owner = text 5-10 cardinality=100
+""")),
+    ('blueprint.fingerprint', (['source', 'fingerprint'], """
+[fingerprint]
+blueprint = transmogrifier.fingerprint
+filename = {tempdir:s}/fingerprints-{size:d}.db
+key = python:item['id']
+""")),
+    ('pipeline.csv_roundtrip', (['csv_source', 'set', 'csv'], CSV_SOURCE + """
+[set]
+blueprint = transmogrifier.set
+title = python:item['title'].upper()
+
+[csv]
+blueprint = transmogrifier.to_csv
+filename = {tempdir:s}/output.csv
+""")),
+    ('pipeline.expression_chain', expression_chain(20)),
+    ('pipeline.nested', nested_pipelines(4)),
+])
+
+# name: patterns of the files of state, which are removed before each run
+STATE = {
+    'blueprint.fingerprint': ['fingerprints-{size:d}.db*'],
+}
+
+runs = count()  # suite runs in this process
+
+
+def get_configuration(name, size, tempdir):
+    pipeline, sections = BENCHMARKS[name]
+    return PIPELINE.format(
+        pipeline='\n'.join(['    ' + section for section in pipeline]),
+        size=size) + sections.replace('{tempdir:s}', tempdir).replace(
+        '{size:d}', text_type(size))
+
+
+def register(name, configuration, tempdir):
+    path = os.path.join(tempdir, name + '.cfg')
+    with io.open(path, 'w', encoding='utf-8') as fp:
+        fp.write(configuration)
+    configuration_registry.registerConfiguration(
+        name=name, title=name, description='n/a', configuration=path)
+    return name
+
+
+def reset(name, size, tempdir):
+    """Remove the state left by the previous runs of the benchmark"""
+    for pattern in STATE.get(name, ()):
+        for path in glob.glob(os.path.join(
+                tempdir, pattern.format(size=size))):
+            os.remove(path)
+
+
+def get_benchmarks(patterns=()):
+    """Return the names of the benchmarks matching any of the patterns"""
+    return [name for name in BENCHMARKS
+            if not patterns or any([fnmatch(name, p) for p in patterns])]
+
+
+def run_suite(names, sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT,
+              callback=None):
+    """Run the named benchmarks at each size and return the results
+
+    Each benchmark pipeline is run ``repeat`` times and the best time is
+    recorded. The state of the previous runs (e.g. stored fingerprints) is
+    removed before each run. ``callback`` is called with (key, result)
+    after each benchmark, where key is ``name@size``.
+
+    The pipelines are registered with ids unique to each call, because their
+    configuration files are removed with the temporary directory of the call.
+
+    """
+    tempdir = tempfile.mkdtemp('transmogrifierBench')
+    prefix = 'transmogrifier.bench.{0:d}.'.format(next(runs))
+    results = OrderedDict()
+    try:
+        for size in sizes:
+            # Write the input files of the source benchmarks
+            Transmogrifier({})(register(
+                prefix + 'setup.{0:d}'.format(size),
+                PIPELINE.format(pipeline='    source\n    csv\n    jsonl',
+                                size=size) +
+                SETUP.format(tempdir=tempdir, size=size), tempdir))
+            for name in names:
+                configuration_id = register(
+                    prefix + '{0:s}.{1:d}'.format(name, size),
+                    get_configuration(name, size, tempdir), tempdir)
+                seconds = min(timeit.repeat(
+                    lambda: Transmogrifier({})(configuration_id),
+                    lambda: reset(name, size, tempdir),
+                    number=1, repeat=repeat))
+                key = '{0:s}@{1:d}'.format(name, size)
+                results[key] = {
+                    'seconds': seconds,
+                    'items_per_second': size / seconds,
+                }
+                if callback is not None:
+                    callback(key, results[key])
+    finally:
+        shutil.rmtree(tempdir)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'results': results,
+    }
+
+
+def get_threshold(key, thresholds):
+    """Return the regression threshold in percent for the benchmark key
+
+    ``thresholds`` is a list of ``percent`` or ``pattern=percent`` strings,
+    where the last matching pattern wins over the default percent.
+
+    """
+    threshold = DEFAULT_THRESHOLD
+    for value in thresholds:
+        if '=' in value:
+            pattern, percent = value.rsplit('=', 1)
+            if fnmatch(key, pattern) or fnmatch(key.split('@')[0], pattern):
+                threshold = float(percent)
+        else:
+            threshold = float(value)
+    return threshold
+
+
+def compare(results, baseline, thresholds=()):
+    """Compare the results against the baseline and return a list of
+    (key, baseline seconds, seconds, change in percent, regression) for the
+    benchmarks found in both
+    """
+    comparison = []
+    for key, result in results['results'].items():
+        try:
+            expected = baseline['results'][key]['seconds']
+        except KeyError:
+            continue
+        change = 100.0 * (result['seconds'] - expected) / expected
+        comparison.append((key, expected, result['seconds'], change,
+                           change > get_threshold(key, thresholds)))
+    return comparison
+
+
+def format_result(key, result):
+    return '{0:40s} {1:10.4f} s {2:12.0f} items/sec'.format(
+        key, result['seconds'], result['items_per_second'])
+
+
+def format_comparison(comparison):
+    lines = []
+    for key, expected, seconds, change, regression in comparison:
+        lines.append(
+            '{0:40s} {1:10.4f} s -> {2:10.4f} s {3:+7.1f}%{4:s}'.format(
+                key, expected, seconds, change,
+                regression and ' REGRESSION' or ''))
+    return '\n'.join(lines)
+
+
+def load(path):
+    with io.open(path, encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+def save(results, path):
+    with io.open(path, 'w', encoding='utf-8') as fp:
+        fp.write(text_type(json.dumps(results, indent=2)))
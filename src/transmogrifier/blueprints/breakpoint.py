@@ -11,8 +11,12 @@ class Breakpoint(ConditionalBlueprint):
     pdb = pdb.Pdb()
 
     def __iter__(self):
+        condition = self.condition
         for item in self.previous:
-            if self.condition(item):
+            if condition.constant is False:
+                yield item
+                continue
+            if condition.constant or condition(item):
                 # noinspection PyProtectedMember
                 self.pdb.set_trace(sys._getframe())  # Break!
             yield item
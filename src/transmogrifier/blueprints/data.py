@@ -1,156 +1,802 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from io import StringIO
-from io import BytesIO
+import array
+import bz2
+import csv
+import gzip
+import importlib
+import io
+import mmap
+import struct
 from csv import DictReader
 from csv import DictWriter
 from email.message import Message
+from itertools import chain
+from itertools import islice
 from operator import methodcaller
 import os
 import sys
 import logging
+import tempfile
+import time
 
+from six import string_types
+from zope.interface import implementer
+
+from transmogrifier.batch import chunked
+from transmogrifier.checkpoint import checkpointed
+from transmogrifier.batch import get_batch_size
+from transmogrifier.batch import iter_batches
+from transmogrifier.fusion import FusableSection
+from transmogrifier.fusion import if_condition
 from transmogrifier.blueprints import Blueprint
 from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.interfaces import IFusableSection
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.parallel import get_pool
+from transmogrifier.parallel import imap
+from transmogrifier.utils import get_bool
 from transmogrifier.utils import is_mapping
 from transmogrifier.utils import get_words
 
 
+try:
+    import lzma
+    HAS_LZMA = True
+except ImportError:
+    try:
+        from backports import lzma
+        HAS_LZMA = True
+    except ImportError:
+        lzma = None
+        HAS_LZMA = False
+
+JSON_BACKENDS = ['orjson', 'ujson', 'simplejson', 'json']
+
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+}
+
 logger = logging.getLogger('transmogrifier')
 
 
-class DelTransform(ConditionalBlueprint):
-    def __iter__(self):
-        keys = get_words(self.options.get('keys'))
-        for item in self.previous:
-            if self.condition(item):
-                for key in keys:
-                    if key in item:
-                        del item[key]
-            yield item
+@implementer(ISectionBatch, IFusableSection)
+class DelTransform(FusableSection, ConditionalBlueprint):
+    def get_code(self, prefix):
+        namespace = {prefix + 'keys': get_words(self.options.get('keys'))}
+        lines = ['for {0:s}key in {0:s}keys:'.format(prefix),
+                 '    if {0:s}key in item:'.format(prefix),
+                 '        del item[{0:s}key]'.format(prefix)]
+        return if_condition(prefix, self.condition, lines,
+                            namespace), namespace
 
 
-class InvertTransform(ConditionalBlueprint):
-    def __iter__(self):
-        key = self.options.get('key')
-        for item in self.previous:
-            if self.condition(item) and is_mapping(item.get(key)):
-                inverted = item.pop(key)
-                for key_, value in item.items():
-                    inverted[key_] = value
-                yield inverted
-            else:
-                yield item
+@implementer(ISectionBatch, IFusableSection)
+class InvertTransform(FusableSection, ConditionalBlueprint):
+    def get_code(self, prefix):
+        namespace = {prefix + 'key': self.options.get('key'),
+                     prefix + 'is_mapping': is_mapping}
+        lines = [
+            '{0:s}inverted = item.pop({0:s}key)'.format(prefix),
+            'for {0:s}key_, {0:s}value in item.items():'.format(prefix),
+            '    {0:s}inverted[{0:s}key_] = {0:s}value'.format(prefix),
+            'item = {0:s}inverted'.format(prefix),
+        ]
+        return if_condition(
+            prefix, self.condition, lines, namespace,
+            '{0:s}is_mapping(item.get({0:s}key))'.format(prefix)), namespace
 
 
-class WrapTransform(ConditionalBlueprint):
-    def __iter__(self):
+@implementer(ISectionBatch, IFusableSection)
+class WrapTransform(FusableSection, ConditionalBlueprint):
+    def get_code(self, prefix):
         key = self.options.get('key')
-        for item in self.previous:
-            if self.condition(item) and key is not None:
-                yield {key: item}
-            else:
-                yield item
+        namespace = {prefix + 'key': key}
+        if key is None:
+            lines = ['pass']  # the condition is evaluated nevertheless
+        else:
+            lines = ['item = {{{0:s}key: item}}'.format(prefix)]
+        return if_condition(prefix, self.condition, lines,
+                            namespace), namespace
 
 
-class CodecTransform(ConditionalBlueprint):
-    def __iter__(self):
-        transforms = {}
-        for name, value in self.options.items():
-            if name in ['blueprint', 'condition']:
-                continue
-            from_, to_ = map(methodcaller('strip'), value.split(':', 1))
-            transforms[name] = (from_, to_)
-
-        for item in self.previous:
-            if self.condition(item):
-                for name, value in transforms.items():
-                    if name not in item:
-                        continue
-
-                    key_value = item[name]
-
-                    if value[0] != 'unicode':
-                        if hasattr(key_value, 'decode'):
-                           key_value = key_value.decode(value[0])
-                    if value[1] != 'unicode':
-                        key_value = key_value.encode(value[1])
-
-                    if isinstance(item, Message):
-                        item.replace_header(name, key_value)
-                    else:
-                        item[name] = key_value
-                        
-            yield item
+def get_codec_transforms(options):
+    transforms = {}
+    for name, value in options.items():
+        if name in ['blueprint', 'condition']:
+            continue
+        from_, to_ = map(methodcaller('strip'), value.split(':', 1))
+        transforms[name] = (from_, to_)
+    return transforms
+
+
+def transcode(item, transforms):
+    for name, value in transforms.items():
+        if name not in item:
+            continue
+
+        key_value = item[name]
+
+        if value[0] != 'unicode':
+            if hasattr(key_value, 'decode'):
+                key_value = key_value.decode(value[0])
+        if value[1] != 'unicode':
+            key_value = key_value.encode(value[1])
+
+        if isinstance(item, Message):
+            item.replace_header(name, key_value)
+        else:
+            item[name] = key_value
+
+
+@implementer(ISectionBatch, IFusableSection)
+class CodecTransform(FusableSection, ConditionalBlueprint):
+    def get_code(self, prefix):
+        namespace = {prefix + 'transforms': get_codec_transforms(self.options),
+                     prefix + 'transcode': transcode}
+        lines = ['{0:s}transcode(item, {0:s}transforms)'.format(prefix)]
+        return if_condition(prefix, self.condition, lines,
+                            namespace), namespace
+
+
+def get_buffer_size(options):
+    return int(options.get('buffer_size') or io.DEFAULT_BUFFER_SIZE)
+
+
+def get_fmtparams(options):
+    """Return csv module format parameters from the section options"""
+    fmtparams = {'dialect': str(options.get('dialect', 'excel').strip())}
+    for name in ['delimiter', 'quotechar']:
+        value = options.get(name)
+        if value:
+            fmtparams[name] = str(value)
+    return fmtparams
+
+
+def get_compression(path, options):
+    """Return compression for the file from ``compression`` option or from
+    the filename extension when the option is missing or ``auto``
+    """
+    compression = (options.get('compression') or 'auto').strip().lower()
+    if compression == 'auto':
+        extension = os.path.splitext(path)[1].lower()
+        return COMPRESSION_EXTENSIONS.get(extension)
+    elif compression in ('none', 'false', 'off', 'no'):
+        return None
+    assert compression in COMPRESSION_EXTENSIONS.values(), \
+        'Unknown compression: {0:s}'.format(compression)
+    assert compression != 'xz' or HAS_LZMA, \
+        'xz compression requires lzma module'
+    return compression
+
+
+def get_compression_level(options):
+    level = options.get('compression_level')
+    return int(level) if level else None
+
+
+def open_compressed(file_, compression, mode, level=None, name=None):
+    """Open compressed stream over the given filename or file object
+
+    The gzip header records the given name (e.g. of the final file for
+    a temporary file) instead of the filename.
+
+    """
+    if compression == 'gzip':
+        if isinstance(file_, string_types) and name is not None:
+            fileobj = io.open(file_, mode)
+            fp = gzip.GzipFile(filename=name, mode=mode, fileobj=fileobj,
+                               compresslevel=9 if level is None else level)
+            fp.myfileobj = fileobj  # closed with fp like its own file
+            return fp
+        elif isinstance(file_, string_types):
+            return gzip.GzipFile(filename=file_, mode=mode,
+                                 compresslevel=9 if level is None else level)
+        return gzip.GzipFile(fileobj=file_, mode=mode,
+                             compresslevel=9 if level is None else level)
+    elif compression == 'bz2':
+        return bz2.BZ2File(file_, mode,
+                           compresslevel=9 if level is None else level)
+    elif compression == 'xz':
+        if 'w' in mode:
+            return lzma.LZMAFile(file_, mode, preset=level)
+        return lzma.LZMAFile(file_, mode)
+
+
+def open_input(path, encoding, buffer_size, compression=None):
+    """Open file (or stdin for '-') for incremental reading with optional
+    decompression as text on Python 3 and as bytes on Python 2
+    """
+    if path == '-':
+        fp = io.open(sys.stdin.fileno(), 'rb', buffering=buffer_size,
+                     closefd=False)
+        if compression:
+            fp = open_compressed(fp, compression, 'rb')
+    elif compression:
+        fp = open_compressed(path, compression, 'rb')
+    else:
+        fp = io.open(path, 'rb', buffering=buffer_size)
+    if sys.version_info[0] < 3:
+        return fp
+    return io.TextIOWrapper(fp, encoding=encoding, newline='')
+
+
+def open_output(path, encoding, buffer_size, compression=None, level=None,
+                atomic=True):
+    """Open temporary file next to path (or path itself, when not atomic,
+    or stdout for '-') for incremental writing with optional compression as
+    text on Python 3 and as bytes on Python 2. Return tuple of the file and
+    its temporary path.
+    """
+    tmp = None
+    if path == '-':
+        if not compression:
+            return sys.stdout, None
+        fp = open_compressed(getattr(sys.stdout, 'buffer', sys.stdout),
+                             compression, 'wb', level)
+    elif not atomic:
+        if compression:
+            fp = open_compressed(path, compression, 'wb', level)
+        else:
+            fp = io.open(path, 'wb', buffering=buffer_size)
+    else:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path),
+                                   prefix='.' + os.path.basename(path) + '.',
+                                   suffix='.tmp')
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)  # mkstemp creates files only for owner
+        if compression:
+            os.close(fd)
+            fp = open_compressed(tmp, compression, 'wb', level,
+                                 os.path.basename(path))
+        else:
+            fp = io.open(fd, 'wb', buffering=buffer_size)
+    if sys.version_info[0] < 3:
+        return fp, tmp
+    return io.TextIOWrapper(fp, encoding=encoding, newline=''), tmp
+
+
+def close_output(fp, tmp, path, completed):
+    """Close file opened with open_output and move its temporary file into
+    path when completed or remove it when not
+    """
+    if fp is sys.stdout:
+        fp.flush()
+    else:
+        fp.close()
+    if tmp is not None:
+        if completed:
+            os.rename(tmp, path)  # atomic on POSIX
+        else:
+            os.remove(tmp)
+
+
+def get_quotechar(fmtparams):
+    return fmtparams.get('quotechar') or \
+        csv.get_dialect(fmtparams['dialect']).quotechar or '"'
+
+
+def count_quotes(path, start, end, quotechar, block_size=2 ** 20):
+    """Return count of quotechar bytes in the given byte range of the file"""
+    count = 0
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        while start < end:
+            block = fp.read(min(block_size, end - start))
+            if not block:
+                break
+            count += block.count(quotechar)
+            start += len(block)
+    return count
+
+
+def find_record_boundary(fp, offset, parity, quotechar, block_size=2 ** 16):
+    """Return offset of the first record boundary at or after the offset
+
+    A record boundary is the position after a newline, which is not inside
+    a quoted field. That is known from the parity of quotechar count before
+    the newline, starting from the given parity at the offset. Doubled
+    quotechars in quoted fields keep the parity intact.
+
+    """
+    if offset > 0 and parity % 2 == 0:
+        fp.seek(offset - 1)
+        if fp.read(1) == b'\n':
+            return offset
+    fp.seek(offset)
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            return offset
+        start = 0
+        while True:
+            newline = block.find(b'\n', start)
+            if newline == -1:
+                parity += block.count(quotechar, start)
+                offset += len(block)
+                break
+            parity += block.count(quotechar, start, newline)
+            if parity % 2 == 0:
+                return offset + newline + 1
+            start = newline + 1
+
+
+def parse_csv_range(path, start, end, parity, quotechar, encoding,
+                    fieldnames, fmtparams):
+    """Return rows of the records starting within the given byte range
+
+    Both ends of the range are first moved forward to the next record
+    boundaries, so that consecutive ranges never split records.
+
+    """
+    with open(path, 'rb') as fp:
+        start = find_record_boundary(fp, start, parity[0], quotechar)
+        end = find_record_boundary(fp, end, parity[1], quotechar)
+        if start >= end:
+            return []
+        fp.seek(start)
+        data = fp.read(end - start)
+    if sys.version_info[0] < 3:
+        buffer_ = io.BytesIO(data)
+    else:
+        buffer_ = io.StringIO(data.decode(encoding), newline='')
+    return list(DictReader(buffer_, fieldnames, **fmtparams))
+
+
+def read_csv_header(path, encoding, fmtparams):
+    """Return fieldnames and byte offset of the first data row"""
+    quotechar = get_quotechar(fmtparams).encode(encoding)
+    with open(path, 'rb') as fp:
+        header_end = find_record_boundary(fp, 0, 0, quotechar)
+        fp.seek(0)
+        header = fp.read(header_end)
+    if sys.version_info[0] < 3:
+        lines = io.BytesIO(header)
+    else:
+        lines = io.StringIO(header.decode(encoding), newline='')
+    return next(csv.reader(lines, **fmtparams), None), header_end
+
+
+def iter_record_boundaries(fp, offset, quotechar, block_size=2 ** 16):
+    """Yield (offset, blank) of all record boundaries after the offset, which
+    must be a record boundary itself, where blank is True for the empty
+    records ending at the boundary, which DictReader skips
+    """
+    parity = 0
+    record = offset  # start of the current record
+    last = b''  # last byte of the previous block
+    fp.seek(offset)
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            break
+        start = 0
+        while True:
+            newline = block.find(b'\n', start)
+            if newline == -1:
+                parity += block.count(quotechar, start)
+                break
+            parity += block.count(quotechar, start, newline)
+            if parity % 2 == 0:
+                boundary = offset + newline + 1
+                length = boundary - record
+                blank = length == 1 or length == 2 and (
+                    block[newline - 1:newline] if newline else last) == b'\r'
+                yield boundary, blank
+                record = boundary
+            start = newline + 1
+        last = block[-1:]
+        offset += len(block)
+
+
+class CSVIndex(object):
+    """Sidecar index of CSV byte offsets for every ``step`` data rows
+
+    The index file has a fixed size little-endian header followed by an
+    array of unsigned 64-bit offsets, where the n:th offset is the start of
+    the data row n * step. The index is only valid for the CSV file with the
+    same size, modification time and quotechar.
 
+    """
+    MAGIC = b'TMGRIDX2'
+    HEADER = struct.Struct(str('<8sQdQQQ'))  # magic size mtime step quote n
 
+    def __init__(self, step, offsets):
+        self.step = step
+        self.offsets = offsets
+
+    @classmethod
+    def get_signature(cls, path, step, quotechar):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime, step, ord(quotechar)
+
+    @classmethod
+    def build(cls, path, step, quotechar, header_end):
+        offsets = array.array(str('Q'), [header_end])
+        row = 0
+        with open(path, 'rb') as fp:
+            size = os.fstat(fp.fileno()).st_size
+            for offset, blank in iter_record_boundaries(
+                    fp, header_end, quotechar):
+                # Rows are counted like DictReader yields them
+                if not blank:
+                    row += 1
+                    if row % step == 0 and offset < size:
+                        offsets.append(offset)
+        return cls(step, offsets)
+
+    @classmethod
+    def load(cls, index_path, path, step, quotechar):
+        """Return memory-mapped index or None when missing or invalid"""
+        try:
+            with open(index_path, 'rb') as fp:
+                header = fp.read(cls.HEADER.size)
+                if len(header) < cls.HEADER.size:
+                    return None
+                fields = cls.HEADER.unpack(header)
+                if (fields[0] != cls.MAGIC or fields[1:-1] !=
+                        cls.get_signature(path, step, quotechar)):
+                    return None
+                if sys.version_info[0] < 3 or sys.byteorder != 'little':
+                    offsets = array.array(str('Q'))
+                    offsets.fromstring(fp.read(8 * fields[-1]))
+                    if sys.byteorder != 'little':
+                        offsets.byteswap()
+                else:
+                    data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                    offsets = memoryview(data)[
+                        cls.HEADER.size:cls.HEADER.size + 8 * fields[-1]
+                    ].cast('Q')
+        except (IOError, OSError, ValueError, struct.error):
+            return None
+        if len(offsets) != fields[-1]:
+            return None
+        return cls(step, offsets)
+
+    def save(self, index_path, path, quotechar):
+        offsets = array.array(str('Q'), self.offsets)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index_path),
+                                   suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(self.HEADER.pack(
+                self.MAGIC, *(self.get_signature(path, self.step, quotechar) +
+                              (len(offsets),))))
+            fp.write(offsets.tobytes() if hasattr(offsets, 'tobytes')
+                     else offsets.tostring())
+        os.rename(tmp, index_path)  # atomic on POSIX
+
+    def lookup(self, row):
+        """Return (offset, row) of the closest indexed row before the row"""
+        position = min(row // self.step, len(self.offsets) - 1)
+        return self.offsets[position], position * self.step
+
+
+def get_csv_index(index_path, path, step, encoding, fmtparams, header_end):
+    """Load a valid sidecar index for the file or build and save a new one
+    """
+    quotechar = get_quotechar(fmtparams).encode(encoding)
+    index = CSVIndex.load(index_path, path, step, quotechar)
+    if index is None:
+        index = CSVIndex.build(path, step, quotechar, header_end)
+        try:
+            index.save(index_path, path, quotechar)
+        except (IOError, OSError):
+            logger.warning('Unable to write CSV index {0:s}'.format(
+                index_path))
+    return index
+
+
+def iter_csv_range(path, encoding, fmtparams, buffer_size, fieldnames,
+                   offset):
+    """Yield rows from the file starting at the given record boundary"""
+    with open(path, 'rb', buffer_size) as fp:
+        fp.seek(offset)
+        if sys.version_info[0] >= 3:
+            fp = io.TextIOWrapper(fp, encoding=encoding, newline='')
+        for row in DictReader(fp, fieldnames, **fmtparams):
+            yield row
+
+
+def iter_csv_parallel(path, encoding, fmtparams, workers, chunk_size,
+                      ordered, fieldnames, offset):
+    """Parse CSV file in byte ranges aligned on record boundaries in a pool
+    of worker processes and yield the rows starting from the given offset
+    """
+    quotechar = get_quotechar(fmtparams).encode(encoding)
+    size = os.path.getsize(path)
+
+    offsets = list(range(offset, size, chunk_size)) + [size]
+    ranges = list(zip(offsets[:-1], offsets[1:]))
+
+    pool = get_pool(workers)
+    try:
+        # Resolve quotechar parity at every range start
+        counts = imap(pool, count_quotes, [
+            (path, start, end, quotechar) for start, end in ranges])
+        parities = [0]
+        for count in counts:
+            parities.append((parities[-1] + count) % 2)
+
+        tasks = [
+            (path, start, end, (parities[i], parities[i + 1]), quotechar,
+             encoding, fieldnames, fmtparams)
+            for i, (start, end) in enumerate(ranges)
+        ]
+        for rows in imap(pool, parse_csv_range, tasks, ordered=ordered):
+            for row in rows:
+                yield row
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+@implementer(ISectionBatch)
 class CSVSource(Blueprint):
+    """Stream items from CSV file rows (or stdin) with constant memory"""
     def __iter__(self):
-        for item in self.previous:
-            yield item
+        return chain(self.previous, checkpointed(self, self.iter_rows))
 
+    def iter_batches(self):
+        size = get_batch_size(self.transmogrifier)
+        return chain(iter_batches(self.previous, size),
+                     chunked(checkpointed(self, self.iter_rows), size))
+
+    def iter_rows(self, resume=0):
         path = self.options.get('filename', 'input.csv').strip()
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        buffer_size = get_buffer_size(self.options)
+        workers = int(self.options.get('workers') or 1)
+        fmtparams = get_fmtparams(self.options)
+        skip = int(self.options.get('skip') or 0) + resume
+        limit = self.options.get('limit')
+        limit = max(int(limit) - resume, 0) if limit else None
+        index = self.options.get('index', '').strip()
 
         if path != '-' and not os.path.isabs(path):
             path = os.path.join(os.getcwd(), path)
 
-        fb_buffer = BytesIO()
-        if path == '-':
-            fb_buffer.write(sys.stdin.read())
-        else:
-            with open(path, 'r') as fb_input:
-                fb_buffer.write(fb_input.read())
-        fb_buffer.seek(0)
+        # Index is either true for the default sidecar path or a custom path
+        if not get_bool(index, bool(index)) or path == '-':
+            index = None
+        elif get_bool(index):
+            index = path + '.idx'
+        elif not os.path.isabs(index):
+            index = os.path.join(os.getcwd(), index)
+
+        # Compressed files can only be read sequentially
+        compression = get_compression(path, self.options)
+
+        if path == '-' or compression or (workers < 2 and index is None):
+            with open_input(path, encoding, buffer_size, compression) as fp:
+                for row in islice(DictReader(fp, **fmtparams),
+                                  skip, None if limit is None
+                                  else skip + limit):
+                    yield row
+            return
+
+        fieldnames, offset = read_csv_header(path, encoding, fmtparams)
+        if not fieldnames:
+            return
+
+        if index is not None:
+            step = int(self.options.get('index_every') or 1000)
+            csv_index = get_csv_index(index, path, step, encoding,
+                                      fmtparams, offset)
+            offset, indexed = csv_index.lookup(skip)
+            skip -= indexed
 
-        reader = DictReader(fb_buffer)
-        for row in reader:
+        if workers > 1:
+            rows = iter_csv_parallel(
+                path, encoding, fmtparams, workers,
+                int(self.options.get('chunk_size') or 2 ** 23),
+                get_bool(self.options.get('ordered'), True),
+                fieldnames, offset)
+        else:
+            rows = iter_csv_range(path, encoding, fmtparams, buffer_size,
+                                  fieldnames, offset)
+        for row in islice(rows, skip,
+                          None if limit is None else skip + limit):
             yield row
 
 
+@implementer(ISectionBatch)
 class CSVConstructor(ConditionalBlueprint):
-    def __iter__(self):  # flake8: noqa
+    """Write items into CSV file (or stdout) as they flow through"""
+    def __iter__(self):
+        for batch in self.write([item] for item in self.previous):
+            yield batch[0]
+
+    def iter_batches(self):
+        return self.write(iter_batches(self.previous,
+                                       get_batch_size(self.transmogrifier)))
+
+    def write(self, batches):  # flake8: noqa
         path = self.options.get('filename', 'output.csv').strip()
         fieldnames = get_words(self.options.get('fieldnames'))
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        buffer_size = get_buffer_size(self.options)
+        flush_every = int(self.options.get('flush_every') or 0)
+        flush_interval = float(self.options.get('flush_interval') or 0)
 
         if path != '-' and not os.path.isabs(path):
             path = os.path.join(os.getcwd(), path)
 
-        if sys.version_info[0] < 3:
-            fp = BytesIO()
-        else:
-            fp = StringIO()
-        writer = DictWriter(fp, list(fieldnames))
+        # Flushed output is written directly into the file to be followed
+        fp, tmp = open_output(path, encoding, buffer_size,
+                              get_compression(path, self.options),
+                              get_compression_level(self.options),
+                              not (flush_every or flush_interval))
+        writer = DictWriter(fp, list(fieldnames),
+                            **get_fmtparams(self.options))
+        flushed = time.time()
+        completed = False
 
         counter = 0
-        for item in self.previous:
-            if self.condition(item) and is_mapping(item):
-                if not writer.fieldnames:
-                    writer.fieldnames = [key for key in item.keys()
-                                         if not key.startswith('_')]
-                if counter == 0:
-                    header = dict(zip(writer.fieldnames, writer.fieldnames))
-                    writer.writerow(header)
-
-                clone = dict(item)
-                for fieldname in writer.fieldnames:
-                    clone.setdefault(fieldname, None)
-                writer.writerow(dict([
-                    (key, value) for key, value in clone.items()
-                    if key in writer.fieldnames
-                ]))
-                counter += 1
-
-            yield item
-        fp.seek(0)
+        condition = self.condition
+        try:
+            for batch in batches:
+                if condition.constant is False:
+                    yield batch
+                    continue
+                for item in batch:
+                    if ((condition.constant or condition(item)) and
+                            is_mapping(item)):
+                        if not writer.fieldnames:
+                            writer.fieldnames = [key for key in item.keys()
+                                                 if not key.startswith('_')]
+                        if counter == 0:
+                            header = dict(zip(writer.fieldnames,
+                                              writer.fieldnames))
+                            writer.writerow(header)
 
-        if path == '-':
-            sys.stdout.write(fp.read())
-        else:
-            with open(path, 'w') as fp2:
-                fp2.write(fp.read())
+                        clone = dict(item)
+                        for fieldname in writer.fieldnames:
+                            clone.setdefault(fieldname, None)
+                        writer.writerow(dict([
+                            (key, value) for key, value in clone.items()
+                            if key in writer.fieldnames
+                        ]))
+                        counter += 1
+
+                        if (flush_every and counter % flush_every == 0 or
+                                flush_interval and
+                                time.time() - flushed >= flush_interval):
+                            fp.flush()
+                            flushed = time.time()
+
+                yield batch
+            completed = True
+        finally:
+            close_output(fp, tmp, path, completed)
 
         logger.info('{0:s}:{1:s} wrote {2:d} items to {3:s}'.format(
             self.__class__.__name__, self.name, counter, path,
             self.options.get('filename', 'output.csv')
         ))
+
+
+def get_json_backend(name='auto'):
+    """Return (loads, dumps) of the named JSON module or, for ``auto``, of the
+    first installed module listed in JSON_BACKENDS
+    """
+    names = name == 'auto' and JSON_BACKENDS or [name]
+    for name_ in names:
+        try:
+            module = importlib.import_module(name_)
+        except ImportError:
+            if name != 'auto':
+                raise
+            continue
+        if name_ == 'orjson':  # orjson dumps into bytes
+            def dumps(obj, dumps_=module.dumps):
+                return dumps_(obj).decode('utf-8')
+        else:
+            dumps = module.dumps
+        return module.loads, dumps
+
+
+@implementer(ISectionBatch)
+class JSONLinesSource(Blueprint):
+    """Stream items from JSON Lines file (or stdin) with constant memory"""
+    def __iter__(self):
+        return chain(self.previous, checkpointed(self, self.iter_lines))
+
+    def iter_batches(self):
+        size = get_batch_size(self.transmogrifier)
+        return chain(iter_batches(self.previous, size),
+                     chunked(checkpointed(self, self.iter_lines), size))
+
+    def iter_lines(self, resume=0):
+        path = self.options.get('filename', 'input.jsonl').strip()
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        buffer_size = get_buffer_size(self.options)
+        loads = get_json_backend(
+            self.options.get('backend', 'auto').strip())[0]
+
+        if path != '-' and not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        with open_input(path, encoding, buffer_size,
+                        get_compression(path, self.options)) as fp:
+            lines = (line for line in fp if line.strip())
+            for line in islice(lines, resume, None):
+                yield loads(line)
+
+
+@implementer(ISectionBatch)
+class JSONLinesConstructor(ConditionalBlueprint):
+    """Write items into JSON Lines file (or stdout) as they flow through"""
+    def __iter__(self):
+        for batch in self.write([item] for item in self.previous):
+            yield batch[0]
+
+    def iter_batches(self):
+        return self.write(iter_batches(self.previous,
+                                       get_batch_size(self.transmogrifier)))
+
+    def write(self, batches):
+        path = self.options.get('filename', 'output.jsonl').strip()
+        keys = get_words(self.options.get('keys'))
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        buffer_size = get_buffer_size(self.options)
+        flush_every = int(self.options.get('flush_every') or 0)
+        flush_interval = float(self.options.get('flush_interval') or 0)
+        dumps = get_json_backend(
+            self.options.get('backend', 'auto').strip())[1]
+
+        if path != '-' and not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        # Flushed output is written directly into the file to be followed
+        fp, tmp = open_output(path, encoding, buffer_size,
+                              get_compression(path, self.options),
+                              get_compression_level(self.options),
+                              not (flush_every or flush_interval))
+        newline = sys.version_info[0] < 3 and b'\n' or '\n'
+        flushed = time.time()
+        completed = False
+
+        counter = 0
+        condition = self.condition
+        try:
+            for batch in batches:
+                if condition.constant is False:
+                    yield batch
+                    continue
+                for item in batch:
+                    if ((condition.constant or condition(item)) and
+                            is_mapping(item)):
+                        if keys:
+                            data = dict([(key, item[key])
+                                         for key in keys if key in item])
+                        else:
+                            data = dict([(key, value)
+                                         for key, value in item.items()
+                                         if not key.startswith('_')])
+                        line = dumps(data)
+                        if sys.version_info[0] < 3 and not isinstance(
+                                line, bytes):
+                            line = line.encode(encoding)
+                        fp.write(line)
+                        fp.write(newline)
+                        counter += 1
+
+                        if (flush_every and counter % flush_every == 0 or
+                                flush_interval and
+                                time.time() - flushed >= flush_interval):
+                            fp.flush()
+                            flushed = time.time()
+
+                yield batch
+            completed = True
+        finally:
+            close_output(fp, tmp, path, completed)
+
+        logger.info('{0:s}:{1:s} wrote {2:d} items to {3:s}'.format(
+            self.__class__.__name__, self.name, counter, path))
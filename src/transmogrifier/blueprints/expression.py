@@ -1,14 +1,27 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from itertools import chain
+from itertools import islice
 import importlib
 
+from transmogrifier.batch import chunked
+from transmogrifier.batch import get_batch_size
+from transmogrifier.batch import iter_batches
 from transmogrifier.blueprints import Blueprint
 from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.checkpoint import checkpointed
 from transmogrifier.expression import Expression
+from transmogrifier.fusion import FusableSection
+from transmogrifier.fusion import add_expressions
+from transmogrifier.fusion import if_condition
+from transmogrifier.fusion import indent
+from transmogrifier.interfaces import IFusableSection
+from transmogrifier.interfaces import ISectionBatch
 from transmogrifier.utils import is_mapping
 from transmogrifier.utils import get_words
 
+from zope.interface import implementer
 from zope.interface.exceptions import BrokenImplementation
 
 import pkg_resources
@@ -55,119 +68,143 @@ def import_modules(modules):
         importlib.import_module(module)
 
 
+def get_section_expressions(blueprint, blacklist):
+    import_modules(get_words(blueprint.options.get('modules')))
+    return get_expressions(
+        blueprint, get_words(blueprint.options.get('expressions')), blacklist)
+
+
+@implementer(ISectionBatch)
 class ExpressionSource(ConditionalBlueprint):
     """Generate items from expressions result"""
     def __iter__(self):
-        for item in self.previous:
-            yield item
+        return chain(self.previous, checkpointed(self, self.iter_items))
 
-        import_modules(get_words(self.options.get('modules')))
-        expressions = get_expressions(
-            self, get_words(self.options.get('expressions')),
-            ['blueprint', 'modules', 'condition', 'expressions']
-        )
+    def iter_batches(self):
+        size = get_batch_size(self.transmogrifier)
+        return chain(iter_batches(self.previous, size),
+                     chunked(checkpointed(self, self.iter_items), size))
+
+    def iter_items(self, resume=0):
+        return islice(self.iter_expression_items(), resume, None)
+
+    def iter_expression_items(self):
+        expressions = get_section_expressions(
+            self, ['blueprint', 'modules', 'condition', 'expressions'])
         assert expressions, 'No expressions defined'
 
+        condition = self.condition
         for name, expression in expressions:
             for item in (expression(None) or []):
+                if condition.constant is False:
+                    continue
                 try:
                     if is_mapping(unwrap(item)):
-                        if self.condition(item):
+                        if condition.constant or condition(item):
                             yield item
                 except BrokenImplementation:
-                    if self.condition({name: item}):
+                    if condition.constant or condition({name: item}):
                         yield {name: item}
             break
 
 
-class ExpressionSetter(ConditionalBlueprint):
+@implementer(ISectionBatch, IFusableSection)
+class ExpressionSetter(FusableSection, ConditionalBlueprint):
     """Set item keys from expressions result"""
-    def __iter__(self):
-        import_modules(get_words(self.options.get('modules')))
-        expressions = get_expressions(
-            self, get_words(self.options.get('expressions')),
-            ['blueprint', 'modules', 'condition', 'expressions']
-        )
+    def get_code(self, prefix):
+        expressions = get_section_expressions(
+            self, ['blueprint', 'modules', 'condition', 'expressions'])
         assert expressions, 'No expressions defined'
 
-        for item in self.previous:
-            if self.condition(item) and is_mapping(item):
-                for name, expression in expressions:
-                    item[name] = expression(item)
-            yield item
+        namespace = {prefix + 'is_mapping': is_mapping}
+        lines = ['item[{0:s}] = {1:s}(item)'.format(name, expression)
+                 for name, expression in add_expressions(
+                     prefix, expressions, namespace)]
+        return if_condition(
+            prefix, self.condition, lines, namespace,
+            '{0:s}is_mapping(item)'.format(prefix)), namespace
 
 
-class ExpressionTransform(ConditionalBlueprint):
+@implementer(ISectionBatch, IFusableSection)
+class ExpressionTransform(FusableSection, ConditionalBlueprint):
     """Executes expressions with items allowing transform or construction"""
-    def __iter__(self):
-        import_modules(get_words(self.options.get('modules')))
-        expressions = get_expressions(
-            self, get_words(self.options.get('expressions')),
-            ['blueprint', 'modules', 'condition', 'expressions']
-        )
+    def get_code(self, prefix):
+        expressions = get_section_expressions(
+            self, ['blueprint', 'modules', 'condition', 'expressions'])
         assert expressions, 'No expressions defined'
 
-        for item in self.previous:
-            if self.condition(item):
-                for name, expression in expressions:
-                    expression(item)
-            yield item
+        namespace = {}
+        lines = ['{0:s}(item)'.format(expression)
+                 for name, expression in add_expressions(
+                     prefix, expressions, namespace)]
+        return if_condition(prefix, self.condition, lines,
+                            namespace), namespace
 
 
-class ExpressionFilterAnd(Blueprint):
+@implementer(ISectionBatch, IFusableSection)
+class ExpressionFilterAnd(FusableSection, Blueprint):
     """Filter items by expressions (AND)"""
-    def __iter__(self):
-        import_modules(get_words(self.options.get('modules')))
-        expressions = get_expressions(
-            self, get_words(self.options.get('expressions')),
-            ['blueprint', 'modules', 'expressions']
-        )
-
-        for item in self.previous:
-            try:
-                for name, expression in expressions:
-                    assert bool(expression(item)), 'Condition failed'
-                yield item
-            except AssertionError:
-                pass
-
-
-class ExpressionFilterOr(Blueprint):
+    def get_code(self, prefix):
+        expressions = get_section_expressions(
+            self, ['blueprint', 'modules', 'expressions'])
+
+        namespace = {}
+        lines = ["assert bool({0:s}(item)), 'Condition failed'".format(
+            expression) for name, expression in add_expressions(
+                prefix, expressions, namespace)]
+        if not lines:
+            return [], namespace
+        return (['try:'] + indent(lines) +
+                ['except AssertionError:', '    continue']), namespace
+
+
+@implementer(ISectionBatch, IFusableSection)
+class ExpressionFilterOr(FusableSection, Blueprint):
     """Filter items by expressions (OR)"""
-    def __iter__(self):
-        import_modules(get_words(self.options.get('modules')))
-        expressions = get_expressions(
-            self, get_words(self.options.get('expressions')),
-            ['blueprint', 'modules', 'expressions']
-        )
+    def get_code(self, prefix):
+        expressions = get_section_expressions(
+            self, ['blueprint', 'modules', 'expressions'])
 
-        for item in self.previous:
-            for name, expression in expressions:
-                if bool(expression(item)):
-                    yield item
-                    break
+        namespace = {}
+        tests = ['bool({0:s}(item))'.format(expression)
+                 for name, expression in add_expressions(
+                     prefix, expressions, namespace)]
+        return ['if not ({0:s}):'.format(' or '.join(tests or ['False'])),
+                '    continue'], namespace
 
 
+@implementer(ISectionBatch)
 class ExpressionInterval(ConditionalBlueprint):
     """Perform standalone expressions by defined interval"""
     def __iter__(self):
-        import_modules(get_words(self.options.get('modules')))
-        expressions = get_expressions(
-            self, get_words(self.options.get('expressions')),
-            ['blueprint', 'modules', 'expressions', 'condition', 'interval']
-        )
+        for batch in self.run([item] for item in self.previous):
+            yield batch[0]
+
+    def iter_batches(self):
+        return self.run(iter_batches(self.previous,
+                                     get_batch_size(self.transmogrifier)))
+
+    def run(self, batches):
+        expressions = get_section_expressions(
+            self, ['blueprint', 'modules', 'expressions', 'condition',
+                   'interval'])
         assert expressions, 'No expressions defined'
 
         counter = interval = int(self.options.get('interval', '1'))
 
-        for item in self.previous:
-            if self.condition(item):
-                counter -= 1
-                if counter == 0:
-                    for name, expression in expressions:
-                        expression(None)
-                    counter = interval
-            yield item
+        condition = self.condition
+        for batch in batches:
+            if condition.constant is False:
+                yield batch
+                continue
+            for item in batch:
+                if condition.constant or condition(item):
+                    counter -= 1
+                    if counter == 0:
+                        for name, expression in expressions:
+                            expression(None)
+                        counter = interval
+            yield batch
 
         if counter != interval:
             for name, expression in expressions:
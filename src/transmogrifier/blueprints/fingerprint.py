@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sqlite3
+import threading
+
+from future.moves.collections import OrderedDict
+from six import text_type
+from zope.interface import implementer
+
+from transmogrifier.batch import chunked
+from transmogrifier.batch import get_batch_size
+from transmogrifier.batch import iter_batches
+from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.expression import Expression
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.utils import get_words
+
+
+logger = logging.getLogger('transmogrifier')
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WINDOW = 10000
+SQLITE_MAX_VARIABLES = 500  # below the limit of 999 of old SQLite versions
+
+
+# Encoder of the values, which cannot be marshalled
+ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'),
+                           default=text_type)
+
+
+def get_hash(algorithm):
+    """Return the hashlib constructor of the named algorithm"""
+    constructor = getattr(hashlib, algorithm, None)
+    if constructor is None:
+        return lambda data: hashlib.new(algorithm, data)
+    return constructor
+
+
+def get_fingerprint(item, keys, hash_=hashlib.sha1):
+    """Return the hex digest of the values of the keys (or of all keys not
+    starting with underscore) of the item
+
+    Values are serialized with marshal (version 2, without references) or,
+    when that does not support them, as JSON. Mappings with the same items in
+    a different order may, therefore, get a different fingerprint, which only
+    passes the item again.
+
+    """
+    if keys:
+        values = tuple([item.get(key) for key in keys])
+    else:
+        values = tuple(sorted([(key, value) for key, value in item.items()
+                               if not key.startswith('_')]))
+    try:
+        data = marshal.dumps(values, 2)
+    except ValueError:  # e.g. datetime
+        data = ENCODER.encode(values).encode('utf-8')
+    return hash_(data).hexdigest()
+
+
+class FingerprintIndex(object):
+    """SQLite table of the fingerprints of items by their keys"""
+
+    def __init__(self, path, table='fingerprints'):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.table = '"{0:s}"'.format(table.replace('"', '""'))
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            # Lost fingerprints only cause items to be passed again
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.execute('PRAGMA synchronous = NORMAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS {0:s} '
+                '(key TEXT PRIMARY KEY, fingerprint TEXT)'.format(self.table))
+
+    def lookup(self, keys):
+        """Return dictionary of the stored fingerprints of the keys"""
+        found = {}
+        with self.lock:
+            for chunk in chunked(keys, SQLITE_MAX_VARIABLES):
+                found.update(self.connection.execute(
+                    'SELECT key, fingerprint FROM {0:s} '
+                    'WHERE key IN ({1:s})'.format(
+                        self.table, ','.join('?' * len(chunk))),
+                    chunk).fetchall())
+        return found
+
+    def update(self, entries):
+        """Store the fingerprints of (key, fingerprint) entries"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO {0:s} (key, fingerprint) '
+                'VALUES (?, ?)'.format(self.table), entries)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+@implementer(ISectionBatch)
+class FingerprintFilter(ConditionalBlueprint):
+    """Drop items whose fingerprint is unchanged since the previous run
+
+    The fingerprint of an item hashes the values of its ``keys`` (or all keys
+    not starting with underscore) and is stored by the item ``key``
+    expression into a SQLite ``table`` in ``filename``. Items are looked up
+    in chunks of ``chunk_size`` items (or in batches, when batching is
+    enabled). The fingerprints of the passed items are stored only once
+    items with their keys have been consumed from the end of the pipeline,
+    so that items failing in a later section are not dropped in the next
+    run. Items not matching the condition are passed without checking.
+
+    """
+
+    def __init__(self, transmogrifier, name, options, previous):
+        super(FingerprintFilter, self).__init__(
+            transmogrifier, name, options, previous)
+        self.key = Expression(
+            options.get('key', 'python:item.get("_path")'),
+            transmogrifier, name, options)
+        self.keys = get_words(options.get('keys'))
+        self.hash = get_hash(options.get('algorithm', 'sha1').strip())
+        self.chunk_size = int(options.get('chunk_size') or
+                              DEFAULT_CHUNK_SIZE)
+        self.window = int(options.get('window') or DEFAULT_WINDOW)
+        self.index = None
+        self.pending = OrderedDict()  # key: fingerprint
+        self.passed = []
+        self.stats = dict(checked=0, unchanged=0, stored=0)
+        consumers = getattr(transmogrifier, 'consumers', None)
+        if consumers is not None:
+            consumers.append(self)
+
+    def __iter__(self):
+        for batch in self.check(chunked(self.previous, self.chunk_size)):
+            for item in batch:
+                yield item
+
+    def iter_batches(self):
+        return self.check(iter_batches(self.previous,
+                                       get_batch_size(self.transmogrifier)))
+
+    def open(self):
+        path = self.options.get('filename', 'fingerprints.db').strip()
+        if not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+        return FingerprintIndex(
+            path, self.options.get('table', 'fingerprints').strip())
+
+    def check(self, batches):
+        if self.index is None:
+            self.index = self.open()
+        condition = self.condition
+        for batch in batches:
+            if condition.constant is False:
+                yield batch
+                continue
+            checked = []
+            for item in batch:
+                if condition.constant or condition(item):
+                    key = self.key(item)
+                    if key is not None:
+                        checked.append((item, text_type(key), get_fingerprint(
+                            item, self.keys, self.hash)))
+            self.stats['checked'] += len(checked)
+
+            found = self.index.lookup([key for item, key, fp in checked])
+            unchanged = set()
+            for item, key, fingerprint in checked:
+                if found.get(key) == fingerprint:
+                    unchanged.add(id(item))
+                else:
+                    self.pending[key] = fingerprint
+            while len(self.pending) > self.window:
+                self.pending.popitem(last=False)  # dropped downstream
+
+            if unchanged:
+                self.stats['unchanged'] += len(unchanged)
+                batch = [item for item in batch if id(item) not in unchanged]
+            if batch:
+                yield batch
+
+    def consume(self, item):
+        """Mark the item consumed from the end of the pipeline"""
+        if not self.pending:
+            return item
+        key = self.key(item)  # also of copied or replaced items
+        if key is None:
+            return item
+        key = text_type(key)
+        fingerprint = self.pending.pop(key, None)
+        if fingerprint is not None:
+            self.passed.append((key, fingerprint))
+            if len(self.passed) >= self.chunk_size:
+                self.flush()
+        return item
+
+    def flush(self):
+        if self.passed:
+            self.index.update(self.passed)
+            self.stats['stored'] += len(self.passed)
+            self.passed = []
+
+    def finish(self):
+        """Store the fingerprints of the consumed items and close the index
+        """
+        if self.index is None:
+            return
+        self.flush()
+        self.index.close()
+        self.index = None
+        self.pending.clear()
+        logger.info('{0:s}:{1:s} checked {2:d} items, dropped {3:d} '
+                    'unchanged and stored {4:d} fingerprints'.format(
+                        self.__class__.__name__, self.name,
+                        self.stats['checked'], self.stats['unchanged'],
+                        self.stats['stored']))
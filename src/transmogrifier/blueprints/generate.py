@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from itertools import chain
+from itertools import count
+from itertools import cycle
+from itertools import islice
+import random
+import string
+
+from future.moves.collections import OrderedDict
+from six.moves import map
+from zope.interface import implementer
+
+from transmogrifier.batch import chunked
+from transmogrifier.batch import get_batch_size
+from transmogrifier.batch import iter_batches
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.checkpoint import checkpointed
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.utils import get_lines
+
+
+DEFAULT_COUNT = 10
+DEFAULT_POOL_SIZE = 1024
+DEFAULT_PERIOD = 65536
+
+ALPHABET = string.ascii_lowercase
+
+
+def get_range(value, cast):
+    """Return (minimum, maximum) of ``min-max`` or a single value"""
+    minimum, sep, maximum = value[1:].partition('-')  # allow negative min
+    minimum = value[:1] + minimum
+    return cast(minimum), cast(maximum if sep else minimum)
+
+
+def make_text(rng, length):
+    return ''.join([rng.choice(ALPHABET) for i in range(length)])
+
+
+def make_pool(rng, type_, args, size):
+    """Return the list of distinct values a field draws its values from"""
+    if type_ == 'int':
+        minimum, maximum = get_range(args[0], int)
+        return [rng.randint(minimum, maximum) for i in range(size)]
+    elif type_ == 'float':
+        minimum, maximum = get_range(args[0], float)
+        return [rng.uniform(minimum, maximum) for i in range(size)]
+    elif type_ == 'text':
+        minimum, maximum = get_range(args and args[0] or '10', int)
+        return [make_text(rng, rng.randint(minimum, maximum))
+                for i in range(size)]
+    elif type_ == 'bool':
+        return [True, False]
+    elif type_ == 'choice':
+        assert args, 'No choices defined'
+        return list(args)
+    raise ValueError('Unknown field type: {0:s}'.format(type_))
+
+
+def draw(rng, pool, size, null=0.0):
+    """Return size values drawn from the pool with probability null of None
+    """
+    if hasattr(rng, 'choices'):
+        values = rng.choices(pool, k=size)
+    else:  # Python 2
+        values = [rng.choice(pool) for i in range(size)]
+    if null:
+        values = [None if rng.random() < null else value
+                  for value in values]
+    return values
+
+
+def parse_field(line):
+    """Return (name, type, positional arguments, keyword arguments) of
+    a ``name = type [argument...] [keyword=value...]`` field line
+    """
+    name, sep, spec = line.partition('=')
+    words = spec.split()
+    assert sep and name.strip() and words, \
+        'Invalid field: {0:s}'.format(line)
+    args = [word for word in words[1:] if '=' not in word]
+    kwargs = dict([word.split('=', 1) for word in words[1:] if '=' in word])
+    return name.strip(), words[0], args, kwargs
+
+
+def compile_builder(names):
+    """Return a function building a new (nested) item from the values of the
+    dotted field names in the given order
+    """
+    tree = OrderedDict()
+    for i, name in enumerate(names):
+        node = tree
+        parts = name.split('.')
+        for part in parts[:-1]:
+            node = node.setdefault(part, OrderedDict())
+            assert isinstance(node, OrderedDict), \
+                'Conflicting field: {0:s}'.format(name)
+        assert parts[-1] not in node, 'Conflicting field: {0:s}'.format(name)
+        node[parts[-1]] = 'v{0:d}'.format(i)
+
+    def display(node):
+        return '{' + ', '.join([
+            '{0!r}: {1:s}'.format(key, display(value)
+                                  if isinstance(value, OrderedDict)
+                                  else value)
+            for key, value in node.items()]) + '}'
+
+    arguments = ', '.join(['v{0:d}'.format(i) for i in range(len(names))])
+    return eval(compile('lambda {0:s}: {1:s}'.format(arguments, display(tree)),
+                        '<generate>', 'eval'))
+
+
+@implementer(ISectionBatch)
+class GenerateSource(Blueprint):
+    """Generate synthetic items from a declared schema
+
+    Values are drawn with a seeded random generator from pools precomputed
+    for each field, into value streams of ``period`` values, which are cycled
+    while building the items. Therefore, items repeat their values (except
+    sequences) every ``period`` items.
+
+    """
+    def __iter__(self):
+        return chain(self.previous, checkpointed(self, self.iter_items))
+
+    def iter_batches(self):
+        size = get_batch_size(self.transmogrifier)
+        return chain(iter_batches(self.previous, size),
+                     chunked(checkpointed(self, self.iter_items), size))
+
+    def iter_items(self, resume=0):
+        # Chained from a generator to set up the fields only on iteration
+        return chain.from_iterable(self.iter_generators(resume))
+
+    def iter_generators(self, resume=0):
+        fields = [parse_field(line) for line in
+                  get_lines(self.options.get('fields'))]
+        assert fields, 'No fields defined'
+        total = int(self.options.get('count') or DEFAULT_COUNT)
+        seed = int(self.options.get('seed') or 0)
+        pool_size = int(self.options.get('pool_size') or DEFAULT_POOL_SIZE)
+        period = min(int(self.options.get('period') or DEFAULT_PERIOD),
+                     max(total, 1))
+
+        rng = random.Random(seed)
+        columns = []
+        for name, type_, args, kwargs in fields:
+            if type_ == 'sequence':
+                columns.append(count(int(args and args[0] or 0)))
+                continue
+            pool = make_pool(rng, type_, args,
+                             int(kwargs.get('cardinality') or pool_size))
+            columns.append(cycle(draw(rng, pool, period,
+                                      float(kwargs.get('null') or 0))))
+        build = compile_builder([name for name, type_, a, k in fields])
+        yield islice(map(build, *columns), resume, total)
@@ -29,8 +29,13 @@ class Logger(ConditionalBlueprint):
             level = int(logging.INFO)
         logger.setLevel(level)
 
+        condition = self.condition
         for item in self.previous:
-            if logger.isEnabledFor(level) and self.condition(item):
+            if condition.constant is False:
+                yield item
+                continue
+            if logger.isEnabledFor(level) and (condition.constant or
+                                               condition(item)):
                 if key is None:
                     copy = {}
                     for key_ in item.keys():
@@ -1,11 +1,32 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
-from zope.component import getUtility
+from itertools import islice
+
+import logging
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+from six import reraise
+from six import text_type
+from six.moves import queue
+from zope.interface import implementer
 
 from transmogrifier.blueprints import Blueprint
+from transmogrifier.expression import Expression
 from transmogrifier.interfaces import ISection
-from transmogrifier.interfaces import ISectionBlueprint
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.parallel import cpu_count
+from transmogrifier.parallel import get_context
+from transmogrifier.parallel import get_pool
+from transmogrifier.parallel import imap
+from transmogrifier.parallel import RemoteError
+from transmogrifier.utils import constructPipeline
+from transmogrifier.utils import get_bool
 from transmogrifier.utils import get_lines
+from transmogrifier.utils import pformat_msg
 
 
 class Pipeline(Blueprint):
@@ -14,26 +35,9 @@ class Pipeline(Blueprint):
     """
 
     def create_pipeline(self, sections, previous):
-        pipeline = []
-        for section_id in sections:
-            if not section_id or section_id == self.name:
-                continue
-
-            blueprint_id = self.transmogrifier[section_id]['blueprint']
-            blueprint = getUtility(ISectionBlueprint, blueprint_id)
-
-            if not pipeline:
-                pipeline = blueprint(self.transmogrifier, section_id,
-                                     self.transmogrifier[section_id], previous)
-            else:
-                pipeline = blueprint(self.transmogrifier, section_id,
-                                     self.transmogrifier[section_id], pipeline)
-
-            if not ISection.providedBy(pipeline):
-                raise ValueError('Blueprint %s for section %s did not return '
-                                 'an ISection' % (blueprint_id, section_id))
-
-        return iter(pipeline)
+        sections = [section_id for section_id in sections
+                    if section_id and section_id != self.name]
+        return constructPipeline(self.transmogrifier, sections, previous)
 
     def __iter__(self):
         assert not self.options.get('condition'), \
@@ -44,10 +48,308 @@ class Pipeline(Blueprint):
         # memory up to the next matching item), and broke the transmogrifier's
         # promise of serial processing.
 
+        # NOTE: constructPipeline splices pipeline sections into their parent
+        # pipeline, so this is only used when the blueprint is called directly
+
         sections = get_lines(self.options.get('pipeline'))
         if sections:
-            previous = self.create_pipeline(sections, self.previous)
+            return iter(self.create_pipeline(sections, self.previous))
+        return iter(self.previous)
+
+
+logger = logging.getLogger('transmogrifier')
+
+ITEMS, ERROR, DONE = range(3)
+
+
+class SectionError(Exception):
+    """Exception raised when sub-pipeline fails processing an item"""
+
+
+def get_section_error(name, e, item):
+    return SectionError(
+        '{0:s}: {1:s} in {2:s} while processing item:\n{3:s}'.format(
+            e.__class__.__name__, str(e), name, pformat_msg(item)))
+
+
+@implementer(ISection, ISectionBatch)
+class Worker(object):
+    """Source of the sub-pipeline of a worker process, which is built once
+    and run in a thread over the chunks of items put into its inbox
+
+    Chunks are yielded as batches, so that batches of the sub-pipeline never
+    span chunks. The results of a chunk are put into the outbox once the
+    sub-pipeline asks for more items. Errors raised while iterating by
+    batches report the whole chunk, as its failed item is not known.
+
+    """
+
+    def __init__(self, transmogrifier, name, options):
+        self.name = name
+        self.inbox = queue.Queue()
+        self.outbox = queue.Queue()
+        self.results = []
+        self.current = None
+        self.error = None
+        self.pipeline = Pipeline(
+            transmogrifier, name, options, None).create_pipeline(
+                get_lines(options.get('pipeline')), self)
+        thread = threading.Thread(
+            target=self.run, name='transmogrifier:{0:s}'.format(name))
+        thread.daemon = True
+        thread.start()
+
+    def __iter__(self):
+        for chunk in self.iter_batches():
+            for item in chunk:
+                self.current = item
+                yield item
+
+    def iter_batches(self):
+        while True:
+            self.current = chunk = self.inbox.get()  # reported on errors
+            yield chunk
+            self.outbox.put(self.results)
+            self.results = []
+
+    def run(self):
+        try:
+            for item in self.pipeline:
+                self.results.append(item)
+        except Exception as e:
+            self.error = (SectionError, get_section_error(
+                self.name, e, self.current), sys.exc_info()[2])
+            self.outbox.put(None)
+
+    def process(self, items):
+        """Return the results of the chunk of items"""
+        if self.error is None:
+            self.inbox.put(items)
+            results = self.outbox.get()
+            if results is not None:
+                return results
+        reraise(*self.error)  # with the traceback of the thread
+
+
+worker = None  # Worker of the current worker process
+
+
+def init_worker(transmogrifier, name, options):
+    global worker
+    worker = Worker(transmogrifier, name, options)
+
+
+def process_chunk(items):
+    """Process chunk of items through the sub-pipeline of the worker"""
+    return worker.process(items)
+
+
+def run_partition(transmogrifier, name, options, index, inbox, outbox):
+    """Process the items of a single partition through the sub-pipeline
+
+    Chunks of items are read from ``inbox`` until None. Results are put into
+    ``outbox`` as (index, ITEMS, items) and completion as (index, DONE,
+    seconds) or (index, ERROR, error).
+
+    """
+    pipeline = Pipeline(transmogrifier, name, options, None)
+    sections = get_lines(options.get('pipeline'))
+    chunk_size = int(options.get('chunk_size') or 100)
+    started = time.time()
+    buffer_ = []
+    current = [None]
+
+    def flush():
+        if buffer_:
+            outbox.put((index, ITEMS, list(buffer_)))
+            del buffer_[:]
+
+    def receive():
+        while True:
+            flush()  # before waiting for more input
+            chunk = inbox.get()
+            if chunk is None:
+                break
+            for item in chunk:
+                current[0] = item
+                yield item
+
+    try:
+        for item in pipeline.create_pipeline(sections, receive()):
+            buffer_.append(item)
+            if len(buffer_) >= chunk_size:
+                flush()
+        flush()
+    except Exception as e:
+        error = get_section_error(name, e, current[0])
+        outbox.put((index, ERROR, RemoteError(
+            '{0:s}: {1:s}'.format(error.__class__.__name__, str(error)),
+            ''.join(traceback.format_exception(*sys.exc_info())))))
+    else:
+        outbox.put((index, DONE, time.time() - started))
+
+
+def get_partition(key, partitions):
+    """Return stable partition index for the key"""
+    if not isinstance(key, bytes):
+        key = text_type(key).encode('utf-8')
+    return (zlib.crc32(key) & 0xffffffff) % partitions
+
+
+class Parallel(Pipeline):
+    """Parallel blueprint runs its sub-pipeline in a pool of processes
+
+    Each of the ``workers`` processes builds its own copy of the sub-pipeline
+    from the same configuration once and is forked to inherit the configured
+    components. Items are sent to the workers in chunks of ``chunk_size``
+    items, and the results of each chunk are returned once the sub-pipeline
+    asks for more items, which makes this suitable for item-by-item
+    transforms, but not for sources, sinks or other sections acting at the
+    end of the pipeline.
+
+    With ``partition`` expression, each item is routed by the hash of its
+    partition key to one of the ``workers`` processes, which run the
+    sub-pipeline once over all the items of their partitions. Items with the
+    same key are, therefore, processed and yielded in their original order,
+    while different keys are processed in parallel. Per-partition throughput
+    and the skew between partitions are logged at the end.
+
+    """
+    timeout = 0.1  # how often blocked calls check for results and exits
+
+    def __init__(self, transmogrifier, name, options, previous):
+        super(Parallel, self).__init__(transmogrifier, name, options, previous)
+        partition = (options.get('partition') or '').strip()
+        if partition:
+            self.partition = Expression(partition, transmogrifier, name,
+                                        options)
         else:
-            previous = self.previous
-        for item in previous:
-            yield item
+            self.partition = None
+        self.stats = []
+
+    def __iter__(self):
+        sections = get_lines(self.options.get('pipeline'))
+        if not sections:
+            for item in self.previous:
+                yield item
+            return
+
+        workers = int(self.options.get('workers') or cpu_count())
+        chunk_size = int(self.options.get('chunk_size') or 100)
+        ordered = get_bool(self.options.get('ordered'), True)
+
+        if self.partition is not None:
+            for item in self.partitioned(workers, chunk_size):
+                yield item
+            return
+
+        def chunks():
+            previous = iter(self.previous)
+            while True:
+                chunk = list(islice(previous, chunk_size))
+                if not chunk:
+                    break
+                yield (chunk,)
+
+        pool = get_pool(workers, init_worker,
+                        (self.transmogrifier, self.name, self.options))
+        try:
+            for items in imap(pool, process_chunk, chunks(), ordered):
+                for item in items:
+                    yield item
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def partitioned(self, workers, chunk_size):
+        stats = self.stats = [dict(items=0, results=0, seconds=0.0)
+                              for i in range(workers)]
+        context = get_context()
+        outbox = context.Queue()
+        inboxes = [context.Queue(2) for i in range(workers)]
+        processes = [context.Process(
+            target=run_partition, name='transmogrifier:{0:s}:{1:d}'.format(
+                self.name, index),
+            args=(self.transmogrifier, self.name, self.options, index,
+                  inboxes[index], outbox)) for index in range(workers)]
+        for process in processes:
+            process.daemon = True
+            process.start()
+
+        running = set(range(workers))
+
+        def receive(block=True):
+            exited = [index for index in running
+                      if processes[index].exitcode is not None]
+            try:
+                index, kind, value = outbox.get(block, self.timeout)
+            except queue.Empty:
+                for index in exited:  # had time to put all their results
+                    raise SectionError(
+                        '{0:s}: partition {1:d} exited with code {2:d} '
+                        'before completing'.format(
+                            self.name, index, processes[index].exitcode))
+                return []
+            if kind == ITEMS:
+                stats[index]['results'] += len(value)
+                return value
+            elif kind == ERROR:
+                raise value
+            else:
+                stats[index]['seconds'] = value
+                running.discard(index)
+                return []
+
+        def send(index, chunk):
+            # Yield available results while the inbox of the worker is full
+            while True:
+                try:
+                    inboxes[index].put(chunk, False)
+                    break
+                except queue.Full:
+                    for result in receive():
+                        yield result
+
+        chunks = [[] for i in range(workers)]
+        try:
+            for item in self.previous:
+                index = get_partition(self.partition(item), workers)
+                stats[index]['items'] += 1
+                chunks[index].append(item)
+                if len(chunks[index]) >= chunk_size:
+                    for result in send(index, chunks[index]):
+                        yield result
+                    chunks[index] = []
+                    for result in receive(False):
+                        yield result
+
+            for index in range(workers):
+                if chunks[index]:
+                    for result in send(index, chunks[index]):
+                        yield result
+                for result in send(index, None):
+                    yield result
+            while running:
+                for result in receive():
+                    yield result
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+            self.log_stats()
+
+    def log_stats(self):
+        counts = [partition['items'] for partition in self.stats]
+        mean = sum(counts) / float(len(counts) or 1)
+        for index, partition in enumerate(self.stats):
+            logger.info(
+                '{0:s}:{1:s} partition {2:d} processed {3:d} items into '
+                '{4:d} items in {5:.1f} seconds ({6:.0f} items/sec)'.format(
+                    self.__class__.__name__, self.name, index,
+                    partition['items'], partition['results'],
+                    partition['seconds'],
+                    partition['items'] / (partition['seconds'] or 1e-9)))
+        logger.info('{0:s}:{1:s} partition skew {2:.2f} '
+                    '(largest partition / mean partition)'.format(
+                        self.__class__.__name__, self.name,
+                        max(counts or [0]) / (mean or 1)))
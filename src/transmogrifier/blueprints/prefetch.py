@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import sys
+import threading
+
+from six import reraise
+from six.moves import queue
+
+from transmogrifier.blueprints import Blueprint
+
+
+logger = logging.getLogger('transmogrifier')
+
+ITEM, ERROR, DONE = range(3)
+
+
+class Prefetch(Blueprint):
+    """Run the upstream part of the pipeline in a background thread
+
+    Items are passed to the downstream sections through a bounded queue of
+    ``size`` items, so that an I/O bound upstream can overlap with a CPU bound
+    downstream. Queue statistics are kept in ``stats`` and logged at the end:
+    ``starved`` counts the times the downstream had to wait for items and
+    ``blocked`` the times the upstream had to wait for free space.
+
+    """
+    timeout = 0.1  # how often a blocked thread checks for termination
+
+    def __init__(self, transmogrifier, name, options, previous):
+        super(Prefetch, self).__init__(transmogrifier, name, options, previous)
+        self.stats = dict(size=int(options.get('size') or 1000),
+                          items=0, starved=0, blocked=0,
+                          max_depth=0, mean_depth=0.0)
+
+    def produce(self, queue_, stop):
+        def put(message):
+            try:
+                queue_.put_nowait(message)
+                return True
+            except queue.Full:
+                self.stats['blocked'] += 1
+            while not stop.is_set():
+                try:
+                    queue_.put(message, timeout=self.timeout)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        previous = iter(self.previous)
+        try:
+            for item in previous:
+                if not put((ITEM, item)):
+                    break
+            else:
+                put((DONE, None))
+        except BaseException:
+            put((ERROR, sys.exc_info()))
+        finally:
+            if stop.is_set() and hasattr(previous, 'close'):
+                previous.close()
+
+    def __iter__(self):
+        stats = self.stats
+        queue_ = queue.Queue(stats['size'])
+        stop = threading.Event()
+        thread = threading.Thread(target=self.produce, args=(queue_, stop),
+                                  name='transmogrifier:' + self.name)
+        thread.daemon = True
+        thread.start()
+
+        depth = 0
+        try:
+            while True:
+                try:
+                    kind, value = queue_.get_nowait()
+                except queue.Empty:
+                    stats['starved'] += 1
+                    kind, value = queue_.get()
+                if kind == ITEM:
+                    size = queue_.qsize()
+                    depth += size
+                    stats['items'] += 1
+                    stats['max_depth'] = max(stats['max_depth'], size)
+                    yield value
+                elif kind == ERROR:
+                    reraise(*value)
+                else:
+                    break
+        finally:
+            stop.set()
+            while thread.is_alive():  # unblock and wait for the producer
+                try:
+                    queue_.get(timeout=self.timeout)
+                except queue.Empty:
+                    pass
+            stats['mean_depth'] = depth / float(stats['items'] or 1)
+            logger.info(
+                '{0:s}:{1:s} prefetched {2:d} items (queue size {3:d}, '
+                'mean depth {4:.1f}, max depth {5:d}, starved {6:d}, '
+                'blocked {7:d})'.format(
+                    self.__class__.__name__, self.name, stats['items'],
+                    stats['size'], stats['mean_depth'], stats['max_depth'],
+                    stats['starved'], stats['blocked']))
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import deque
+from contextlib import contextmanager
+from itertools import chain
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from six import text_type
+
+from transmogrifier.batch import chunked
+from transmogrifier.expression import get_option
+from transmogrifier.stats import clock
+from transmogrifier.utils import get_bool
+from transmogrifier.utils import get_words
+from transmogrifier.utils import is_mapping
+
+
+logger = logging.getLogger('transmogrifier')
+
+DEFAULT_CHECKPOINT_INTERVAL = 60.0  # seconds
+DEFAULT_CHECKPOINT_KEYS = '_path id'
+DEFAULT_CHECKPOINT_WINDOW = 100000  # items produced ahead of the last section
+TRACK_CHUNK_SIZE = 100
+DRAIN_CHECK_EVERY = 100  # items between checking whether a save is due
+
+
+def get_checkpoint(transmogrifier):
+    """Return the checkpoint of the transmogrifier or None when disabled
+
+    Checkpoints are enabled with ``checkpoint = <file>`` in the
+    ``[transmogrifier]`` section and loaded from the file on
+    ``resume = true``.
+
+    """
+    path = (get_option(transmogrifier, 'checkpoint') or '').strip()
+    if not path:
+        return None
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    checkpoint = Checkpoint(
+        path, getattr(transmogrifier, 'configuration_id', None),
+        float(get_option(transmogrifier, 'checkpoint_interval',
+                         DEFAULT_CHECKPOINT_INTERVAL)),
+        get_words(get_option(transmogrifier, 'checkpoint_key',
+                             DEFAULT_CHECKPOINT_KEYS)))
+    if get_bool(get_option(transmogrifier, 'resume'), False):
+        checkpoint.load()
+    return checkpoint
+
+
+def checkpointed(section, iter_items):
+    """Return the items of the source section tracked for checkpoints
+
+    ``iter_items`` is called with the number of items to skip, which is
+    the position of the section in the resumed checkpoint or 0.
+
+    """
+    checkpoint = getattr(section.transmogrifier, 'checkpoint', None)
+    if checkpoint is None:
+        return iter_items(0)
+    position = checkpoint.get_position(section.name)
+    return checkpoint.track(section.name, iter_items(position), position)
+
+
+def load_checkpoints(path):
+    try:
+        with io.open(path, encoding='utf-8') as fp:
+            return json.load(fp)
+    except (IOError, OSError):
+        return {}
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock of the file at path (where supported), e.g. for
+    pipelines run in parallel processes sharing a checkpoint file
+    """
+    if fcntl is None:
+        yield
+        return
+    with io.open(path, 'ab') as fp:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def save_checkpoints(checkpoints, path):
+    """Write the checkpoints into a temporary file, which is then renamed
+    over the path, so that the file is always either old or new
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path),
+                               prefix='.' + os.path.basename(path) + '.',
+                               suffix='.tmp')
+    try:
+        with io.open(fd, 'w', encoding='utf-8') as fp:
+            fp.write(text_type(json.dumps(checkpoints, indent=2,
+                                          sort_keys=True)))
+            fp.flush()
+            os.fsync(fp.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.rename(tmp, path)  # atomic on POSIX
+
+
+class Checkpoint(object):
+    """Persist the progress of a pipeline into a file for resuming it
+
+    Sources count the items they produce and keep references to their latest
+    ``window`` items, which are matched by identity (references keep the ids
+    of the items from being reused). Every ``interval`` seconds the count of
+    the item last consumed from the end of the pipeline is saved as the
+    position of its source, together with the item key (the value of the
+    first of ``keys`` found in the item). A resumed source skips the items
+    before its position.
+
+    Items after the saved positions (and those of other sources than the one
+    of the last item) may have been processed already before the resume.
+    Items replaced with new objects by sections cannot be tracked to their
+    sources, which delays the checkpoint until a tracked item is consumed.
+    Once the pipeline has completed, the positions are the counts of all the
+    items produced by the sources.
+
+    """
+
+    def __init__(self, path, pipeline=None,
+                 interval=DEFAULT_CHECKPOINT_INTERVAL, keys=(),
+                 window=DEFAULT_CHECKPOINT_WINDOW):
+        self.path = path
+        self.pipeline = pipeline or 'pipeline'
+        self.interval = interval
+        self.keys = keys
+        self.window = window
+        self.positions = {}
+        self.key = None
+        self.items = 0
+        self.complete = False
+        self.recent = {}
+        self.produced = {}
+
+    def load(self):
+        state = load_checkpoints(self.path).get(self.pipeline)
+        if not state:
+            return
+        self.positions = dict(state['positions'])
+        self.key = state['key']
+        self.items = state['items']
+        self.complete = state['complete']
+        logger.info('{0:s} resumed after {1:d} items (last {2!s})'.format(
+            self.pipeline, self.items, self.key))
+
+    def get_position(self, name):
+        return self.positions.get(name, 0)
+
+    def track(self, name, items, position=0):
+        """Return the items of the named source counting them from position
+        """
+        recent = self.recent[name] = deque(maxlen=self.window)
+        self.produced[name] = position
+
+        def iter_chunks():
+            # Items are counted in chunks to keep the overhead per item low
+            for chunk in chunked(items, TRACK_CHUNK_SIZE):
+                recent.extend(chunk)
+                self.produced[name] += len(chunk)
+                yield chunk
+        return chain.from_iterable(iter_chunks())
+
+    def drain(self, pipeline):
+        """Consume the pipeline saving the checkpoint when due and once more
+        when the pipeline ends or fails
+        """
+        item = None
+        items = self.items
+        due = clock() + self.interval
+        try:
+            for items, item in enumerate(pipeline, items + 1):
+                if not items % DRAIN_CHECK_EVERY and clock() >= due:
+                    self.items = items
+                    if self.update(item):
+                        self.save()
+                        due = clock() + self.interval
+        except BaseException:
+            self.items = items
+            self.finish(item)
+            raise
+        self.items = items
+        self.finish(complete=True)
+
+    def update(self, item):
+        """Update the position of the source of the item and return True, or
+        return False when the item cannot be tracked to a source
+        """
+        for name, recent in self.recent.items():
+            for i, item_ in enumerate(reversed(recent)):
+                if item_ is item:
+                    self.positions[name] = self.produced[name] - i
+                    self.key = self.get_key(item)
+                    return True
+        return False
+
+    def get_key(self, item):
+        if is_mapping(item):
+            for key in self.keys:
+                if key in item:
+                    value = item[key]
+                    if value is None or isinstance(
+                            value, (bool, int, float, text_type)):
+                        return value
+                    return text_type(value)
+        return None
+
+    def save(self):
+        with locked(self.path + '.lock'):
+            checkpoints = load_checkpoints(self.path)
+            checkpoints[self.pipeline] = {
+                'positions': self.positions,
+                'key': self.key,
+                'items': self.items,
+                'complete': self.complete,
+                'time': time.time(),
+            }
+            save_checkpoints(checkpoints, self.path)
+
+    def finish(self, item=None, complete=False):
+        """Save the final checkpoint after the last consumed item"""
+        if item is not None:
+            self.update(item)
+        if complete:
+            self.positions.update(self.produced)
+        self.complete = complete
+        self.save()
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+import ast
+
 from transmogrifier.expression import Expression
+from transmogrifier.expression import is_native
 
 
 class Condition(Expression):
@@ -7,6 +10,28 @@ class Condition(Expression):
 
     Test if a pipeline item matches the given TALES expression.
 
+    Conditions with a literal python expression (e.g. the default
+    ``python:True``) are folded into a constant at construction time and
+    are never evaluated. Callers test ``condition.constant`` for True or
+    False before calling the condition to skip the call completely.
+
     """
+    def __init__(self, expression, transmogrifier, name, options, **extras):
+        super(Condition, self).__init__(
+            expression, transmogrifier, name, options, **extras)
+        self.constant = get_constant(self.prefix, self.source)
+
     def __call__(self, item, **extras):
+        if self.constant is not None:
+            return self.constant
         return bool(super(Condition, self).__call__(item, **extras))
+
+
+def get_constant(prefix, source):
+    """Return boolean value of a literal python expression or None"""
+    if not is_native(prefix, source):
+        return None
+    try:
+        return bool(ast.literal_eval(source.strip()))
+    except (ValueError, SyntaxError):
+        return None
@@ -2,6 +2,11 @@
 from __future__ import unicode_literals
 
 import functools
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
 from logging import getLogger
 from logging import DEBUG
 import sys
@@ -9,13 +14,30 @@ import sys
 from chameleon import tales
 from chameleon.astutil import Builtin
 
+from chameleon.compiler import Compiler
 from chameleon.compiler import ExpressionEngine
-from chameleon.compiler import ExpressionEvaluator
+from chameleon.nodes import Assignment
+from chameleon.nodes import Context
+from chameleon.nodes import Module
 from chameleon.tales import ExpressionParser
 from chameleon.tales import match_prefix
+from chameleon.tales import split_parts
+
+from future.moves.collections import OrderedDict
+from six.moves import builtins as __builtin__
 
 from transmogrifier.utils import pformat_msg
 
+try:
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version as get_distribution_version
+except ImportError:  # Python < 3.8
+    from pkg_resources import DistributionNotFound as PackageNotFoundError
+    from pkg_resources import get_distribution
+
+    def get_distribution_version(distribution):
+        return get_distribution(distribution).version
+
 
 try:
     from z3c.pt import expressions
@@ -25,6 +47,265 @@ except ImportError:
     HAS_Z3C_PT = False
 
 DEFAULT_EXPRESSION_TYPE = 'python'
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_ENGINE = 'chameleon'
+NATIVE_ENGINE = 'native'
+
+# Bump when the generated expression code changes
+BYTECODE_CACHE_VERSION = 1
+BYTECODE_CACHE_ENVIRON = 'TRANSMOGRIFIER_EXPRESSION_CACHE'
+
+if HAS_Z3C_PT:
+    ENGINE_TYPE = 'z3c.pt'
+    EXPRESSION_TYPES = {
+        'python': expressions.PythonExpr,
+        'string': tales.StringExpr,
+        'not': tales.NotExpr,
+        'exists': expressions.ExistsExpr,
+        'path': expressions.PathExpr,
+        'provider': expressions.ProviderExpr,
+        'nocall': expressions.NocallExpr,
+    }
+else:
+    ENGINE_TYPE = 'chameleon'
+    EXPRESSION_TYPES = {
+        'python': tales.PythonExpr,
+        'string': tales.StringExpr,
+        'not': tales.NotExpr,
+        'exists': tales.ExistsExpr,
+        'import': tales.ImportExpr,
+        'structure': tales.StructureExpr,
+    }
+
+parser = ExpressionParser(EXPRESSION_TYPES, DEFAULT_EXPRESSION_TYPE)
+engine = functools.partial(ExpressionEngine, parser,
+                           default_marker=Builtin('False'))
+
+
+def split_expression(expression):
+    """Return (prefix, source) for the given TALES expression string"""
+    m = match_prefix(expression)
+    if m is not None:
+        return m.group(1), expression[m.end():]
+    else:
+        return DEFAULT_EXPRESSION_TYPE, expression
+
+
+class ExpressionCache(object):
+    """A bounded LRU cache of compiled expressions
+
+    Compiled expressions are keyed by (prefix, source, engine type, names),
+    where names are the builtin names the expression has been compiled
+    against. The cache is shared by all expressions in the process.
+
+    """
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                pass
+            else:
+                self._data[key] = value  # mark as most recently used
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = factory()
+
+        with self._lock:
+            self._data[key] = value
+            while self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._data), maxsize=self.maxsize)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+expression_cache = ExpressionCache()
+
+
+def get_version(distribution):
+    try:
+        return get_distribution_version(distribution)
+    except PackageNotFoundError:
+        return None
+
+
+# Versions keying the on-disk bytecode cache, looked up once per process
+BYTECODE_CACHE_VERSIONS = (
+    BYTECODE_CACHE_VERSION,
+    sys.version,
+    get_version('Chameleon'),
+    HAS_Z3C_PT and get_version('z3c.pt') or None,
+)
+
+
+class BytecodeCache(object):
+    """A persistent on-disk cache of compiled expression code
+
+    Code objects are stored with marshal into the cache directory with
+    a filename hashed from the expression key, the cache version, the
+    Python version and the versions of Chameleon and z3c.pt. Upgrading any of
+    those libraries, therefore, invalidates all the cached code.
+
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.versions = BYTECODE_CACHE_VERSIONS
+
+    def get_path(self, key):
+        digest = hashlib.sha1(
+            repr((key, self.versions)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.marshal')
+
+    def load(self, key):
+        try:
+            with open(self.get_path(key), 'rb') as fp:
+                return marshal.load(fp)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def store(self, key, code):
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fp:
+                marshal.dump(code, fp)
+            os.rename(tmp, self.get_path(key))  # atomic on POSIX
+        except (IOError, OSError):
+            getLogger('transmogrifier').warning(
+                'Unable to write expression cache into {0:s}'.format(
+                    self.directory))
+
+
+def compile_code(prefix, source, names):
+    """Generate code object for the expression with Chameleon"""
+    assignment = Assignment(['_result'], '%s:%s' % (prefix, source), True)
+    module = Module('evaluate', Context(assignment))
+    compiler = Compiler(engine, module, '<string>', source,
+                        ('econtext', 'rcontext') + tuple(names))
+    return compile(compiler.code, '<string>', 'exec')
+
+
+def compile_expression(prefix, source, names, directory=None):
+    """Compile the expression into a Chameleon evaluate function
+
+    The returned function must be called with (econtext, rcontext, *values),
+    where values are given in the same order as names and the result of the
+    evaluation is stored into econtext['_result'].
+
+    When ``directory`` is given, the code generated by Chameleon is read from
+    and stored into an on-disk bytecode cache in that directory.
+
+    """
+    if directory:
+        cache = BytecodeCache(directory)
+        key = (prefix, source, ENGINE_TYPE, tuple(names))
+        code = cache.load(key)
+        if code is None:
+            code = compile_code(prefix, source, names)
+            cache.store(key, code)
+    else:
+        code = compile_code(prefix, source, names)
+    env = {}
+    exec(code, env)
+    return env['evaluate']
+
+
+def get_compiled(prefix, source, names, directory=None):
+    """Return the compiled expression from the process-wide cache"""
+    key = (prefix, source, ENGINE_TYPE, tuple(names))
+    return expression_cache.get(key, functools.partial(
+        compile_expression, prefix, source, names, directory))
+
+
+def is_native(prefix, source):
+    """Test if the expression can be evaluated by the native engine
+
+    Only plain python expressions are supported. Expressions using the TALES
+    pipe operator for fallback values are left for Chameleon.
+
+    """
+    return prefix == 'python' and split_parts.search(source) is None
+
+
+def compile_native(source, names=()):
+    """Compile python expression into a code object of a lambda, which
+    returns the result of the expression for the given item and the values of
+    the extra names
+    """
+    # Mimic Chameleon in handling of whitespace and line continuations
+    source = tales.re_continuation.sub('\n', source.strip())
+    source = source.replace('\n', ' ')
+    return compile('lambda {0:s}: ({1:s})'.format(
+        ', '.join(('item',) + tuple(names)), source), '<expression>', 'eval')
+
+
+def get_compiled_native(source, names=()):
+    """Return the native code object from the process-wide cache"""
+    key = ('python', source, NATIVE_ENGINE, tuple(names))
+    return expression_cache.get(key, functools.partial(
+        compile_native, source, names))
+
+
+def get_option(transmogrifier, name, default=None):
+    """Return option from the ``[transmogrifier]`` section or the default"""
+    try:
+        options = transmogrifier['transmogrifier']
+    except (KeyError, TypeError):
+        return default
+    return (options.get(name) or '').strip() or default
+
+
+def get_engine(transmogrifier):
+    """Return the expression engine configured for the transmogrifier
+
+    The engine is configured with ``expression_engine`` option in the
+    ``[transmogrifier]`` section and is either ``chameleon`` or ``native``.
+
+    """
+    engine_ = get_option(transmogrifier, 'expression_engine', DEFAULT_ENGINE)
+    assert engine_ in (DEFAULT_ENGINE, NATIVE_ENGINE), \
+        'Unknown expression engine: {0:s}'.format(engine_)
+    return engine_
+
+
+def get_cache_directory(transmogrifier):
+    """Return the on-disk expression cache directory or None
+
+    The directory is configured with ``expression_cache`` option in the
+    ``[transmogrifier]`` section or ``TRANSMOGRIFIER_EXPRESSION_CACHE``
+    environment variable.
+
+    """
+    directory = get_option(transmogrifier, 'expression_cache',
+                           os.environ.get(BYTECODE_CACHE_ENVIRON) or None)
+    if directory and not os.path.isabs(directory):
+        directory = os.path.join(os.getcwd(), directory)
+    return directory
 
 
 class Expression(object):
@@ -40,30 +321,10 @@ class Expression(object):
         self.options = options
         self.extras = extras
 
-        if HAS_Z3C_PT:
-            self.expression_types = {
-                'python': expressions.PythonExpr,
-                'string': tales.StringExpr,
-                'not': tales.NotExpr,
-                'exists': expressions.ExistsExpr,
-                'path': expressions.PathExpr,
-                'provider': expressions.ProviderExpr,
-                'nocall': expressions.NocallExpr,
-            }
-        else:
-            self.expression_types = {
-                'python': tales.PythonExpr,
-                'string': tales.StringExpr,
-                'not': tales.NotExpr,
-                'exists': tales.ExistsExpr,
-                'import': tales.ImportExpr,
-                'structure': tales.StructureExpr,
-            }
-
-        parser = ExpressionParser(self.expression_types,
-                                  DEFAULT_EXPRESSION_TYPE)
-        engine = functools.partial(ExpressionEngine, parser,
-                                   default_marker=Builtin('False'))
+        self.prefix, self.source = split_expression(expression)
+        self.engine = get_engine(transmogrifier)
+        self.cache_directory = get_cache_directory(transmogrifier)
+
         context = {
             'context': transmogrifier.context,
             'decode': lambda x: x.decode('utf-8'),
@@ -74,25 +335,52 @@ class Expression(object):
             'transmogrifier': transmogrifier,
         }
         context.update(extras)
-        self.evaluator = ExpressionEvaluator(engine, context)
+        self.names = tuple(sorted(context.keys()))
+        self.builtins = tuple([context[key] for key in self.names])
+        self.evaluate = None  # compiled on first call
 
         logger_base = getattr(
             transmogrifier, 'configuration_id', 'transmogrifier')
         self.logger = getLogger(logger_base + '.' + name)
 
-    def __call__(self, item, **extras):
-        context = {'item': item}
-        context.update(extras)
+    def compile(self):
+        """Return evaluate function for (item, extras) for this expression
+        """
+        if self.engine == NATIVE_ENGINE and is_native(self.prefix,
+                                                      self.source):
+            code = get_compiled_native(self.source)
+            namespace = dict(zip(self.names, self.builtins))
+            namespace['__builtins__'] = __builtin__
+            function = eval(code, namespace)
+            functions = {}  # by the names of the extras
 
-        m = match_prefix(self.expression)
-        if m is not None:
-            prefix = m.group(1)
-            expr = self.expression[m.end():]
+            def evaluate(item, extras):
+                if not extras:
+                    return function(item)
+                names = tuple(sorted(extras))
+                try:
+                    function_ = functions[names]
+                except KeyError:
+                    function_ = functions[names] = eval(
+                        get_compiled_native(self.source, names), namespace)
+                return function_(item, **extras)
         else:
-            prefix = DEFAULT_EXPRESSION_TYPE
-            expr = self.expression
+            compiled = get_compiled(self.prefix, self.source, self.names,
+                                    self.cache_directory)
+            builtins_ = self.builtins
+
+            def evaluate(item, extras):
+                econtext = {'item': item}
+                econtext.update(extras)
+                compiled(econtext, {}, *builtins_)
+                return econtext['_result']
 
-        result = self.evaluator(context, {}, prefix, expr)
+        return evaluate
+
+    def __call__(self, item, **extras):
+        if self.evaluate is None:
+            self.evaluate = self.compile()
+        result = self.evaluate(item, extras)
 
         if self.logger.isEnabledFor(DEBUG):
             formatted = pformat_msg(result)
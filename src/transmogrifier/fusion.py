@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from zope.interface import implementer
+
+from transmogrifier.batch import get_batch_size
+from transmogrifier.batch import iter_batches
+from transmogrifier.expression import get_option
+from transmogrifier.interfaces import IFusableSection
+from transmogrifier.interfaces import ISection
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.utils import get_bool
+
+
+def get_fusion(transmogrifier):
+    """Return True when section fusion is enabled for the transmogrifier
+
+    Fusion is enabled by default and disabled with ``fusion = false`` in the
+    ``[transmogrifier]`` section.
+
+    """
+    return get_bool(get_option(transmogrifier, 'fusion'), True)
+
+
+def indent(lines, level=1):
+    return ['    ' * level + line for line in lines]
+
+
+def if_condition(prefix, condition, lines, namespace, test=None):
+    """Return lines run only when the section condition (and optional test)
+    are true, evaluated in the same order as in the unfused section
+    """
+    if condition.constant is False:
+        return []  # neither the condition nor the test is evaluated
+    tests = []
+    if not condition.constant:
+        namespace[prefix + 'condition'] = condition
+        tests.append('{0:s}condition(item)'.format(prefix))
+    if test:
+        tests.append(test)
+    if not tests:
+        return lines
+    return ['if {0:s}:'.format(' and '.join(tests))] + indent(lines)
+
+
+def add_expressions(prefix, expressions, namespace):
+    """Add (name, expression) pairs into namespace and return their names
+    in the namespace
+    """
+    names = []
+    for i, (name, expression) in enumerate(expressions):
+        namespace['{0:s}name{1:d}'.format(prefix, i)] = name
+        namespace['{0:s}expression{1:d}'.format(prefix, i)] = expression
+        names.append(('{0:s}name{1:d}'.format(prefix, i),
+                      '{0:s}expression{1:d}'.format(prefix, i)))
+    return names
+
+
+def compile_fused(name, sections):
+    """Compile the code of fusable sections into an item generator and
+    a batch generator
+    """
+    # Unfused sections are set up from the last to the first, because
+    # each section starts its previous section only after its own set up
+    codes = [section.get_code('_s{0:d}_'.format(i))
+             for i, section in reversed(list(enumerate(sections)))]
+    codes.reverse()
+
+    namespace = {}
+    lines = []
+    for lines_, namespace_ in codes:
+        lines.extend(lines_)
+        namespace.update(namespace_)
+
+    source = '\n'.join(
+        ['def iter_items(previous):',
+         '    for item in previous:'] +
+        indent(lines, 2) +
+        ['        yield item',
+         '',
+         'def iter_batches(batches):',
+         '    for batch in batches:',
+         '        processed = []',
+         '        for item in batch:'] +
+        indent(lines, 3) +
+        ['            processed.append(item)',
+         '        if processed:',
+         '            yield processed'])
+    exec(compile(source, '<fused {0:s}>'.format(name), 'exec'), namespace)
+    return namespace['iter_items'], namespace['iter_batches']
+
+
+@implementer(ISection, ISectionBatch)
+class FusedSection(object):
+    """Process items through the code of consecutive fusable sections in
+    a single loop instead of a chain of generators
+    """
+
+    def __init__(self, transmogrifier, sections, previous):
+        self.transmogrifier = transmogrifier
+        self.sections = sections
+        self.name = '+'.join([section.name for section in sections])
+        self.previous = previous
+
+    def __iter__(self):
+        iter_items = compile_fused(self.name, self.sections)[0]
+        for item in iter_items(self.previous):
+            yield item
+
+    def iter_batches(self):
+        iter_batches_ = compile_fused(self.name, self.sections)[1]
+        for batch in iter_batches_(iter_batches(
+                self.previous, get_batch_size(self.transmogrifier))):
+            yield batch
+
+
+@implementer(ISection, ISectionBatch, IFusableSection)
+class FusableSection(object):
+    """Mixin for blueprints, which process their items and batches with the
+    same code of ``get_code`` they are fused with
+
+    Subclasses overriding ``__iter__`` are neither fused nor batched.
+
+    """
+
+    def __iter__(self):
+        iter_items = compile_fused(self.name, [self])[0]
+        for item in iter_items(self.previous):
+            yield item
+
+    def iter_batches(self):
+        iter_batches_ = compile_fused(self.name, [self])[1]
+        for batch in iter_batches_(iter_batches(
+                self.previous, get_batch_size(self.transmogrifier))):
+            yield batch
+
+    def get_code(self, prefix):
+        raise NotImplementedError('get_code')
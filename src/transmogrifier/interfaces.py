@@ -54,6 +54,54 @@ class ISection(zope.interface.Interface):
         """
 
 
+# noinspection PyMethodParameters
+class ISectionBatch(zope.interface.Interface):
+    """A section in a transmogrifier pipe, which can process batches of items
+    """
+
+    def iter_batches():
+        """Iterate over lists of items.
+
+        Batch sections process batches of the previous section to produce
+        batches for the next section, amortizing the per-item overhead of
+        chained generators. They must also implement ISection for pipelines
+        without batching.
+
+        """
+
+
+# noinspection PyMethodParameters
+class IFusableSection(zope.interface.Interface):
+    """A section, which can be fused with its neighbouring fusable sections
+    into a single section processing items in a single loop
+    """
+
+    def get_code(prefix):
+        """Return (lines, namespace) of Python code processing a single item.
+
+        The lines are run in a loop with the current item in local variable
+        ``item``. They may modify the item, replace it by assigning a new
+        ``item`` or drop it with ``continue``. All the other names used by the
+        code must start with the prefix and be defined in the namespace.
+
+        """
+
+
+# noinspection PyMethodParameters
+class IAsyncSection(zope.interface.Interface):
+    """An asynchronous section in a transmogrifier pipe"""
+
+    def __aiter__():
+        """Asynchronous pipe sections are asynchronous iterables.
+
+        They are iterated in an event loop shared by all the asynchronous
+        sections of the pipeline, and may, therefore, wait for many I/O
+        operations at once. Synchronous and asynchronous sections can be mixed
+        freely in the same pipeline.
+
+        """
+
+
 # BBB: Support collective.transmogrifier
 try:
     pkg_resources.get_distribution('collective.transmogrifier')
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import time
+
+from six.moves import queue
+
+from transmogrifier.interfaces import ITransmogrifier
+from transmogrifier.parallel import call_safely
+from transmogrifier.parallel import get_context
+from transmogrifier.profiler import SamplingProfiler
+from transmogrifier.utils import get_words
+from transmogrifier.utils import load_config
+
+
+logger = logging.getLogger('transmogrifier')
+
+JOB_TIMEOUT = 1.0  # seconds between checking for exited job processes
+
+
+def get_dependencies(pipelines):
+    """Return the dependencies of the pipelines among the pipelines
+
+    Dependencies are declared with ``depends`` in the ``[transmogrifier]``
+    section as a list of pipeline ids. Dependencies on pipelines, which are
+    not run, are ignored.
+
+    """
+    dependencies = {}
+    for pipeline in pipelines:
+        options = load_config(pipeline).get('transmogrifier', {})
+        dependencies[pipeline] = [
+            dependency for dependency in get_words(options.get('depends'))
+            if dependency in pipelines and dependency != pipeline]
+    return dependencies
+
+
+def sort_pipelines(pipelines, dependencies):
+    """Return the pipelines in their given order, except that each pipeline
+    is moved after its dependencies
+    """
+    ordered = []
+    remaining = list(pipelines)
+    while remaining:
+        for pipeline in remaining:
+            if all([dependency in ordered
+                    for dependency in dependencies[pipeline]]):
+                ordered.append(pipeline)
+                remaining.remove(pipeline)
+                break
+        else:
+            raise ValueError('Circular pipeline dependencies: {0:s}'.format(
+                ', '.join(remaining)))
+    return ordered
+
+
+def run_pipeline(pipeline, context, overrides):
+    """Run the pipeline and return its statistics (or None)"""
+    transmogrifier = ITransmogrifier(context)
+    transmogrifier(pipeline, **overrides)
+    return getattr(transmogrifier, 'stats', None)
+
+
+def run_profiled(pipeline, context, overrides, profile):
+    """Run the pipeline and return its statistics (or None) and its profile
+    samples (or None)
+    """
+    if not profile:
+        return run_pipeline(pipeline, context, overrides), None
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        stats = run_pipeline(pipeline, context, overrides)
+    finally:
+        profiler.stop()
+    return stats, dict(profiler.samples)
+
+
+def run_job(pipeline, context, overrides, profile, completed):
+    """Run the pipeline in a job process with its log messages prefixed with
+    its id and put (pipeline, (True, (statistics, samples)) or (False,
+    error)) into the completed queue
+    """
+    formatter = logging.Formatter('[{0:s}] {1:s}'.format(
+        pipeline.replace('%', '%%'), logging.BASIC_FORMAT))
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(formatter)
+    completed.put((pipeline, call_safely(
+        run_profiled, (pipeline, context, overrides, profile))))
+
+
+def run_jobs(pipelines, jobs, context, overrides, profiler=None):
+    """Run the pipelines in up to ``jobs`` processes at once and return a
+    list of (pipeline, success, statistics or error) in the order of the
+    pipelines
+
+    Each pipeline is run in its own forked process as soon as its
+    dependencies have completed successfully. The processes are not daemonic,
+    so that pipelines may start processes of their own. Pipelines depending
+    on a failed pipeline are not run, but failed, and so are pipelines,
+    whose processes exit without a result. With a profiler, the processes
+    are sampled and the samples of the completed pipelines are merged into
+    the profiler under their pipeline ids.
+
+    """
+    dependencies = get_dependencies(pipelines)
+    sort_pipelines(pipelines, dependencies)  # fail early on cycles
+
+    results = {}
+    waiting = list(pipelines)
+    running = {}  # pipeline: process
+    started = {}
+    context_ = get_context()
+    completed = context_.Queue()
+
+    def start(pipeline):
+        process = context_.Process(
+            target=run_job, name='transmogrifier:{0:s}'.format(pipeline),
+            args=(pipeline, context, overrides, profiler is not None,
+                  completed))
+        started[pipeline] = time.time()
+        running[pipeline] = process
+        process.start()
+
+    def receive():
+        """Return the next (pipeline, result) or None after a timeout,
+        which fails the pipelines of the processes exited without a result
+        """
+        exited = [pipeline for pipeline, process in running.items()
+                  if process.exitcode is not None]
+        try:
+            return completed.get(True, JOB_TIMEOUT)
+        except queue.Empty:
+            pass
+        for pipeline in exited:  # had time to put their results
+            return pipeline, (False, RuntimeError(
+                'Process exited with code {0:d}'.format(
+                    running[pipeline].exitcode)))
+        return None
+
+    try:
+        while waiting or running:
+            for pipeline in list(waiting):
+                states = [results.get(dependency, (None,))[0]
+                          for dependency in dependencies[pipeline]]
+                if False in states:
+                    waiting.remove(pipeline)
+                    results[pipeline] = (False, RuntimeError(
+                        'Skipped after failed dependencies'))
+                    logger.error('{0:s} skipped after failed '
+                                 'dependencies'.format(pipeline))
+                elif None not in states and len(running) < jobs:
+                    waiting.remove(pipeline)
+                    start(pipeline)
+            if not running:
+                continue
+            received = receive()
+            if received is None:
+                continue
+            pipeline, result = received
+            running.pop(pipeline).join()
+            if result[0]:
+                stats, samples = result[1]
+                if profiler is not None:
+                    profiler.merge(samples, pipeline)
+                result = (True, stats)
+            results[pipeline] = result
+            seconds = time.time() - started[pipeline]
+            if result[0]:
+                logger.info('{0:s} completed in {1:.1f} seconds'.format(
+                    pipeline, seconds))
+            else:
+                logger.error('{0:s} failed in {1:.1f} seconds: {2!s}'.format(
+                    pipeline, seconds, result[1]))
+    finally:
+        for process in running.values():
+            process.terminate()
+            process.join()
+    return [(pipeline,) + tuple(results[pipeline]) for pipeline in pipelines]
@@ -1,14 +1,25 @@
 # -*- coding: utf-8 -*-
 """
-Usage: transmogrify <pipelines_and_overrides>...
+Usage: transmogrify bench [--size=<n>...] [--filter=<pattern>...]
+                          [--repeat=<n>] [--output=<file>]
+                          [--baseline=<file>] [--threshold=<percent>...]
+                          [--include=package_or_module>...]
+       transmogrify <pipelines_and_overrides>...
                     [--overrides=overrides.cfg>]
                     [--include=package_or_module>...]
                     [--include=package:filename>...]
                     [--context=<package.module.factory>]
+                    [--stats=<file>]
+                    [--profile=<file>]
+                    [--checkpoint=<file> [--resume]]
+                    [--jobs=<n>]
        transmogrify --list
                     [--include=package_or_module>...]
        transmogrify --show=<pipeline>
                     [--include=package_or_module>...]
+       transmogrify --plan=<pipeline>
+                    [--overrides=overrides.cfg>]
+                    [--include=package_or_module>...]
 """
 from __future__ import unicode_literals
 from __future__ import print_function
@@ -16,6 +27,8 @@ from contextlib import contextmanager
 from operator import add
 from functools import reduce
 
+import io
+import json
 import os
 import importlib
 import logging
@@ -24,6 +37,7 @@ import sys
 from docopt import docopt
 from future.moves.collections import OrderedDict
 from six import BytesIO
+from six import text_type
 from zope.component import getUtilitiesFor
 from zope.component.hooks import getSite
 from zope.component.hooks import setSite
@@ -35,9 +49,15 @@ from configparser import RawConfigParser
 
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.interfaces import ITransmogrifier
+from transmogrifier.jobs import get_dependencies
+from transmogrifier.jobs import run_jobs
+from transmogrifier.jobs import run_pipeline
+from transmogrifier.jobs import sort_pipelines
+from transmogrifier.profiler import SamplingProfiler
 from transmogrifier.registry import configuration_registry
 from transmogrifier.utils import load_config
 from transmogrifier.utils import get_lines
+from transmogrifier.utils import plan_pipeline
 
 from pkg_resources import get_distribution
 from pkg_resources import DistributionNotFound
@@ -186,6 +206,119 @@ def resolve(pipeline):
     return resolved
 
 
+def register(pipeline):
+    """Register pipeline configuration file unless already registered"""
+    try:
+        configuration_registry.getConfiguration(pipeline)
+    except KeyError:
+        path = (os.path.isabs(pipeline) and pipeline or
+                os.path.join(os.getcwd(), pipeline))
+        if os.path.isfile(path):
+            configuration_registry.registerConfiguration(
+                name=pipeline, title=pipeline,
+                description='n/a', configuration=path)
+        else:
+            raise
+
+
+def format_plan(transmogrifier, pipeline, overrides=None):
+    """Return the plan of the pipeline as indented text, fused sections
+    joined with ``+`` and sub-pipelines indented under their sections
+    """
+    lines = []
+
+    def format_group(group, indent):
+        lines.append('{0:s}{1:s}'.format(indent, ' + '.join([
+            '{0:s} ({1:s})'.format(section_id, blueprint_id)
+            for section_id, blueprint_id in group])))
+        for section_id, blueprint_id in group:
+            sections = [section for section in get_lines(
+                transmogrifier[section_id].get('pipeline') or '')
+                if section != section_id]
+            if sections:
+                for sub_group in plan_pipeline(transmogrifier, sections):
+                    format_group([entry[:2] for entry in sub_group],
+                                 indent + '    ')
+
+    for group in transmogrifier.plan(pipeline, **(overrides or {})):
+        format_group(group, '')
+    return '\n'.join(lines)
+
+
+def bench(arguments):
+    """Run the benchmark suite, write its results and compare them against
+    the baseline and return 1 on regressions (or 0)
+    """
+    from transmogrifier import bench as suite
+
+    # Keep the output readable (e.g. by hiding constructor messages)
+    logging.getLogger('transmogrifier').setLevel(logging.WARNING)
+
+    results = suite.run_suite(
+        suite.get_benchmarks(arguments.get('--filter')),
+        [int(size) for size in arguments.get('--size')] or suite.DEFAULT_SIZES,
+        int(arguments.get('--repeat') or suite.DEFAULT_REPEAT),
+        lambda key, result: print(suite.format_result(key, result)))
+
+    if arguments.get('--output'):
+        suite.save(results, arguments.get('--output'))
+
+    if not arguments.get('--baseline'):
+        return 0
+    comparison = suite.compare(results, suite.load(arguments['--baseline']),
+                               arguments.get('--threshold'))
+    print('')
+    print(suite.format_comparison(comparison))
+    regressions = [key for key, expected, seconds, change, regression
+                   in comparison if regression]
+    if regressions:
+        print('\n{0:d} regressions: {1:s}'.format(
+            len(regressions), ', '.join(regressions)))
+        return 1
+    return 0
+
+
+def write_stats(stats, path):
+    """Write the section statistics of the pipelines as JSON into the file
+    or, when the path is ``-``, into stdout
+    """
+    if path == '-':
+        print(json.dumps(stats, indent=2, sort_keys=True))
+        return
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    with io.open(path, 'w', encoding='utf-8') as fp:
+        fp.write(text_type(json.dumps(stats, indent=2, sort_keys=True)))
+
+
+@contextmanager
+def profiled(path, workers=False):
+    """Sample the pipelines run within the context and write the samples
+    in collapsed stack format into the file at path (unless it is None)
+
+    With ``workers``, the pipelines are run in worker processes, which are
+    sampled there, and only their samples merged into the yielded profiler
+    are written.
+
+    """
+    if not path:
+        yield None
+        return
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    profiler = SamplingProfiler()
+    if not workers:
+        profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.save(path)
+        logging.getLogger('transmogrifier').info(
+            'Wrote {0:d} samples into {1:s}'.format(
+                sum(profiler.samples.values()), path))
+
+
 @contextmanager
 def global_site_manager():
     site = getSite()
@@ -200,13 +333,19 @@ def __main__():
     # Enable logging
     logging.basicConfig(level=logging.INFO)
 
-    # Parse cli arguments
-    arguments = docopt(__doc__, argv=get_argv()[1:])
+    # Parse cli arguments (with --stats allowed also without a file)
+    arguments = docopt(__doc__, argv=[
+        '--stats=' if argument == '--stats' else argument
+        for argument in get_argv()[1:]])
 
     # Resolve configuration
     with global_site_manager():
         configure(arguments)
 
+    # Run benchmark suite
+    if arguments.get('bench'):
+        sys.exit(bench(arguments))
+
     # Show registered components
     if arguments.get('--list'):
         blueprints = dict(getUtilitiesFor(ISectionBlueprint))
@@ -229,17 +368,7 @@ Available pipelines
     # Show specified configuration
     if arguments.get('--show'):
         pipeline = arguments.get('--show')
-        try:
-            configuration_registry.getConfiguration(pipeline)
-        except KeyError:
-            path = (os.path.isabs(pipeline) and pipeline or
-                    os.path.join(os.getcwd(), pipeline))
-            if os.path.isfile(path):
-                configuration_registry.registerConfiguration(
-                    name=pipeline, title=pipeline,
-                    description='n/a', configuration=path)
-            else:
-                raise
+        register(pipeline)
 
         output = BytesIO()
         resolve(pipeline).write(output)
@@ -247,9 +376,31 @@ Available pipelines
 
         return
 
+    # Show optimized plan of specified configuration
+    if arguments.get('--plan'):
+        pipeline = arguments.get('--plan')
+        register(pipeline)
+        print(format_plan(ITransmogrifier(dict()), pipeline,
+                          get_overrides(arguments)))
+        return
+
     # Load optional overrides
     overrides = get_overrides(arguments)
 
+    # Enable optional section statistics
+    stats_path = arguments.get('--stats')
+    if stats_path is not None:
+        overrides.setdefault('transmogrifier', {})
+        overrides['transmogrifier']['stats'] = 'true'
+    stats = []
+
+    # Enable optional checkpoints (and resuming from them)
+    if arguments.get('--checkpoint'):
+        overrides.setdefault('transmogrifier', {})
+        overrides['transmogrifier']['checkpoint'] = arguments['--checkpoint']
+        if arguments.get('--resume'):
+            overrides['transmogrifier']['resume'] = 'true'
+
     # Initialize optional context
     context_path = arguments.get('--context')
     if context_path is None:
@@ -259,12 +410,41 @@ Available pipelines
         context_module = importlib.import_module(context_module_path)
         context = getattr(context_module, context_class_name)()
 
-    # Transmogrify
-    for pipeline in get_pipelines(arguments):
+    # Register pipeline configuration files
+    pipelines = list(get_pipelines(arguments))
+    for pipeline in pipelines:
         path = (os.path.isabs(pipeline) and pipeline or
                 os.path.join(os.getcwd(), pipeline))
         if os.path.isfile(path):
             configuration_registry.registerConfiguration(
                 name=pipeline, title=pipeline,
                 description='n/a', configuration=path)
-        ITransmogrifier(context)(pipeline, **overrides)
+
+    # Transmogrify (with optional sampling profiler)
+    failed = []
+    jobs = int(arguments.get('--jobs') or 1)
+    with profiled(arguments.get('--profile'), jobs > 1) as profiler:
+        if jobs > 1:
+            # Independent pipelines in parallel processes
+            for pipeline, success, result in run_jobs(
+                    pipelines, jobs, context, overrides, profiler):
+                if not success:
+                    failed.append(pipeline)
+                elif result is not None:
+                    stats.append(result)
+        else:
+            for pipeline in sort_pipelines(
+                    pipelines, get_dependencies(pipelines)):
+                result = run_pipeline(pipeline, context, overrides)
+                if result is not None:
+                    stats.append(result)
+
+    # Write optional section statistics
+    if stats_path:
+        write_stats(stats, stats_path)
+
+    if failed:
+        logging.getLogger('transmogrifier').error(
+            '{0:d} of {1:d} pipelines failed: {2:s}'.format(
+                len(failed), len(pipelines), ', '.join(failed)))
+        sys.exit(1)
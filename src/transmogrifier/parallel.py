@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import deque
+import multiprocessing
+import sys
+import traceback
+
+from six.moves import queue
+
+
+class RemoteError(Exception):
+    """Exception raised in a worker process with its formatted traceback"""
+
+    def __init__(self, message, formatted):
+        super(RemoteError, self).__init__(message)
+        self.formatted = formatted
+
+    def __reduce__(self):
+        return self.__class__, (self.args[0], self.formatted)
+
+    def __str__(self):
+        return '{0:s}\n\nRemote traceback:\n{1:s}'.format(
+            super(RemoteError, self).__str__(), self.formatted)
+
+
+def call_safely(function, args):
+    """Call function in a worker and return (True, result) or (False, error)
+
+    Exceptions are caught and returned, because unpicklable exceptions would
+    otherwise hang or break the pool.
+
+    """
+    try:
+        return True, function(*args)
+    except Exception as e:
+        return False, RemoteError(
+            '{0:s}: {1:s}'.format(e.__class__.__name__, str(e)),
+            ''.join(traceback.format_exception(*sys.exc_info())))
+
+
+def get_result(result):
+    success, value = result
+    if not success:
+        raise value
+    return value
+
+
+def imap(pool, function, tasks, ordered=True, window=None):
+    """Yield results of function(*args) for args in tasks from the pool
+
+    At most ``window`` tasks (defaults to twice the pool size) are in flight
+    at once, so memory use is bounded also when the consumer is slower than
+    the workers. Results are yielded in task order or, when ``ordered`` is
+    false, in completion order.
+
+    """
+    window = window or 2 * getattr(pool, '_processes', 1)
+    tasks = iter(tasks)
+    completed = queue.Queue()
+    pending = deque()
+    exhausted = False
+
+    callbacks = {'callback': completed.put}
+    if sys.version_info[0] >= 3:
+        # Failures outside call_safely, e.g. unpicklable results
+        callbacks['error_callback'] = lambda e: completed.put((False, e))
+
+    while True:
+        while not exhausted and len(pending) < window:
+            try:
+                args = next(tasks)
+            except StopIteration:
+                exhausted = True
+                break
+            if ordered:
+                pending.append(pool.apply_async(
+                    call_safely, (function, args)))
+            else:
+                pending.append(pool.apply_async(
+                    call_safely, (function, args), **callbacks))
+        if not pending:
+            break
+        if ordered:
+            yield get_result(pending.popleft().get())
+        else:
+            pending.pop()
+            yield get_result(completed.get())
+
+
+def get_context():
+    """Return the multiprocessing context starting processes by forking
+
+    Forked processes inherit the components configured in the main process,
+    e.g. the registered blueprints and pipelines, which is required by the
+    workers, but not the default start method on every platform.
+
+    """
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork')
+    return multiprocessing  # Python 2 always forks on POSIX
+
+
+def get_pool(processes, initializer=None, initargs=(),
+             maxtasksperchild=None):
+    return get_context().Pool(processes, initializer, initargs,
+                              maxtasksperchild)
+
+
+def cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import Counter
+import io
+import os
+import sys
+import threading
+
+from six import string_types
+
+from transmogrifier.interfaces import ISection
+
+
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+
+
+def get_section_label(frame):
+    """Return the label of the section running the frame or None
+
+    Sections are recognized as the ``self`` of a method frame, which provides
+    ISection and has the name it was constructed with.
+
+    """
+    code = frame.f_code
+    if not code.co_argcount:
+        return None
+    section = frame.f_locals.get(code.co_varnames[0])
+    method = getattr(type(section), code.co_name, None)
+    if getattr(method, '__code__', None) is not code:
+        return None
+    name = getattr(section, 'name', None)
+    if not isinstance(name, string_types) or not ISection.providedBy(section):
+        return None
+    options = getattr(section, 'options', None)
+    blueprint = getattr(options, 'get', lambda key: None)('blueprint')
+    if blueprint:
+        return '{0:s} ({1:s})'.format(name, blueprint)
+    return name
+
+
+def get_frame_label(frame):
+    code = frame.f_code
+    return '{0:s} ({1:s}:{2:d})'.format(
+        code.co_name, os.path.basename(code.co_filename),
+        code.co_firstlineno)
+
+
+def get_stack(frame, root):
+    """Return the collapsed stack of the frame starting from its outermost
+    section frame (or only the innermost frame when no section is running)
+
+    Frames of the code compiled for fusable sections are attributed to the
+    section running them.
+
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+
+    labels = [root]
+    section = False
+    for frame in frames:
+        label = get_section_label(frame)
+        if label is not None:
+            section = True
+            if label == labels[-1]:
+                continue  # another method of the same section
+        elif section and frame.f_code.co_filename.startswith('<fused '):
+            continue
+        elif section:
+            label = get_frame_label(frame)
+        else:
+            continue
+        labels.append(label.replace(';', ','))
+    if not section and frames:
+        labels.append(get_frame_label(frames[-1]).replace(';', ','))
+    return ';'.join(labels)
+
+
+class SamplingProfiler(object):
+    """Sample the stacks of the pipeline threads in a background thread
+
+    The thread, which starts the profiler, and threads with a name starting
+    with ``transmogrifier:`` (e.g. prefetch threads) are sampled every
+    ``interval`` seconds. Samples are attributed to pipeline sections by
+    their names and written in the collapsed stack format of flamegraph
+    tools, one ``frame;frame;frame count`` line per distinct stack.
+
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.target = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.target = threading.current_thread().ident
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run,
+                                       name='profiler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        own = threading.current_thread().ident
+        names = dict([(thread.ident, thread.name)
+                      for thread in threading.enumerate()])
+        # noinspection PyProtectedMember
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident) or ''
+            if ident == own or not (ident == self.target or
+                                    name.startswith('transmogrifier:')):
+                continue
+            self.samples[get_stack(frame, name.replace(';', ','))] += 1
+
+    def merge(self, samples, root):
+        """Add the samples (e.g. of another process) under the root frame"""
+        root = root.replace(';', ',')
+        for stack, count in samples.items():
+            self.samples['{0:s};{1:s}'.format(root, stack)] += count
+
+    def write(self, fp):
+        for stack, count in sorted(self.samples.items()):
+            fp.write('{0:s} {1:d}\n'.format(stack, count))
+
+    def save(self, path):
+        with io.open(path, 'w', encoding='utf-8') as fp:
+            self.write(fp)
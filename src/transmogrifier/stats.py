@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import time
+
+from zope.interface import alsoProvides
+from zope.interface import implementer
+
+from transmogrifier.batch import is_batch_section
+from transmogrifier.expression import get_option
+from transmogrifier.interfaces import ISection
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.utils import get_bool
+
+
+logger = logging.getLogger('transmogrifier')
+
+clock = getattr(time, 'perf_counter', time.time)  # Python 2
+
+
+def get_stats(transmogrifier):
+    """Return True when section statistics are enabled for the transmogrifier
+
+    Statistics are enabled with ``stats = true`` in the ``[transmogrifier]``
+    section. When disabled, sections are not wrapped at all.
+
+    """
+    return get_bool(get_option(transmogrifier, 'stats'), False)
+
+
+class ConditionMeter(object):
+    """Count the evaluations and passes of a section condition"""
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.constant = condition.constant
+        self.evaluated = 0
+        self.passed = 0
+
+    def __call__(self, item, **extras):
+        self.evaluated += 1
+        result = self.condition(item, **extras)
+        if result:
+            self.passed += 1
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.condition, name)
+
+
+def meter_conditions(section):
+    """Replace the condition of a conditional section with a meter and return
+    the list of added meters
+    """
+    condition = getattr(section, 'condition', None)
+    if condition is None or not hasattr(condition, 'constant'):
+        return []
+    section.condition = ConditionMeter(condition)
+    return [section.condition]
+
+
+@implementer(ISection)
+class SectionMeter(object):
+    """Count the items yielded by the section and the time spent in it
+
+    Inclusive time is the time spent waiting for the next item (or batch) of
+    the section. Exclusive time excludes the inclusive time of the previous
+    section, when that is metered too.
+
+    """
+
+    def __init__(self, section, name, previous=None, conditions=()):
+        self.section = section
+        self.name = name
+        self.previous = isinstance(previous, SectionMeter) and previous or None
+        self.conditions = conditions
+        self.items = 0
+        self.inclusive = 0.0
+        self.iterator = iter(section)
+        if is_batch_section(section):
+            alsoProvides(self, ISectionBatch)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = clock()
+        try:
+            item = next(self.iterator)
+        finally:
+            self.inclusive += clock() - start
+        self.items += 1
+        return item
+
+    next = __next__  # Python 2
+
+    def iter_batches(self):
+        batches = iter(self.section.iter_batches())
+        while True:
+            start = clock()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                break
+            finally:
+                self.inclusive += clock() - start
+            self.items += len(batch)
+            yield batch
+
+    @property
+    def exclusive(self):
+        if self.previous is None:
+            return self.inclusive
+        return max(self.inclusive - self.previous.inclusive, 0.0)
+
+    def get_stats(self):
+        stats = {
+            'section': self.name,
+            'items_in': (None if self.previous is None
+                         else self.previous.items),
+            'items_out': self.items,
+            'inclusive': self.inclusive,
+            'exclusive': self.exclusive,
+            'evaluated': None,
+            'passed': None,
+        }
+        conditions = [condition for condition in self.conditions
+                      if not condition.constant]
+        if conditions:
+            stats['evaluated'] = sum([c.evaluated for c in conditions])
+            stats['passed'] = sum([c.passed for c in conditions])
+        return stats
+
+
+def get_report(transmogrifier):
+    """Return the statistics of the metered sections of the transmogrifier
+    as a JSON serializable dictionary
+    """
+    meters = getattr(transmogrifier, 'meters', None) or []
+    sections = [meter.get_stats() for meter in meters]
+    return {
+        'pipeline': getattr(transmogrifier, 'configuration_id', None),
+        'total': max([s['inclusive'] for s in sections] or [0.0]),
+        'sections': sections,
+    }
+
+
+def format_report(report):
+    """Return the statistics as a table with a row for each metered section
+    """
+    total = report['total'] or 1.0
+    width = max([len(s['section']) for s in report['sections']] + [7])
+    row = ('{0:' + str(width) + 's} {1:>9s} {2:>9s} {3:>9s} {4:>6s} '
+           '{5:>9s} {6:>6s}')
+    lines = [row.format('section', 'in', 'out', 'excl (s)', 'excl',
+                        'incl (s)', 'pass')]
+    for s in report['sections']:
+        lines.append(row.format(
+            s['section'],
+            '-' if s['items_in'] is None else '{0:d}'.format(s['items_in']),
+            '{0:d}'.format(s['items_out']),
+            '{0:.3f}'.format(s['exclusive']),
+            '{0:.0f}%'.format(100 * s['exclusive'] / total),
+            '{0:.3f}'.format(s['inclusive']),
+            '-' if not s['evaluated'] else '{0:.0f}%'.format(
+                100.0 * s['passed'] / s['evaluated'])))
+    return '\n'.join(lines)
+
+
+def log_report(report):
+    logger.info('{0:s} section statistics:\n{1:s}'.format(
+        report['pipeline'] or 'pipeline', format_report(report)))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Tests of asynchronous sections, which are syntax errors before Python 3.6
+and therefore imported only by test_aio on Python 3.6 or later
+"""
+import asyncio
+import threading
+import unittest
+
+from transmogrifier import Transmogrifier
+from transmogrifier.aio import AsyncBlueprint
+from transmogrifier.aio import aiterate
+from transmogrifier.aio import imap
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.interfaces import ISectionBlueprint
+from transmogrifier.testing import TransmogrifierLayer
+from zope.component import provideUtility
+
+
+class AsyncSource(AsyncBlueprint):
+    async def __aiter__(self):
+        async for item in aiterate(self.previous):
+            yield item
+        for i in range(int(self.options.get('size') or 5)):
+            await asyncio.sleep(0)
+            yield {'id': i}
+
+
+class AsyncTransform(AsyncBlueprint):
+    async def __aiter__(self):
+        async for item in aiterate(self.previous):
+            item.setdefault('trail', []).append(self.name)
+            yield item
+
+
+class SyncTransform(Blueprint):
+    def __iter__(self):
+        for item in self.previous:
+            item.setdefault('trail', []).append(self.name)
+            item['thread'] = threading.current_thread().name
+            yield item
+
+
+class Collect(Blueprint):
+    items = []
+
+    def __iter__(self):
+        for item in self.previous:
+            self.items.append(item)
+            yield item
+
+
+class AsyncSectionTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        Collect.items = []
+        for name, blueprint in [('async_source', AsyncSource),
+                                ('async_transform', AsyncTransform),
+                                ('sync_transform', SyncTransform),
+                                ('collect', Collect)]:
+            provideUtility(blueprint, ISectionBlueprint,
+                           name='transmogrifier.tests.' + name)
+
+    def _run(self, *sections):
+        config = '[transmogrifier]\npipeline =\n'
+        for name in sections:
+            config += '    {0:s}\n'.format(name)
+        for name in sections:
+            config += '[{0:s}]\nblueprint = transmogrifier.tests.{1:s}\n'\
+                .format(name, name.rstrip('0123456789'))
+        self.layer.registerConfiguration('transmogrifier.tests.aio', config)
+        transmogrifier = Transmogrifier({})
+        transmogrifier('transmogrifier.tests.aio')
+        self.assertIsNone(transmogrifier.event_loop)
+        return Collect.items
+
+    def testMixedPipeline(self):
+        items = self._run('async_source', 'sync_transform1',
+                          'async_transform1', 'async_transform2',
+                          'sync_transform2', 'collect')
+        self.assertEqual([item['id'] for item in items], list(range(5)))
+        self.assertEqual(items[0]['trail'],
+                         ['sync_transform1', 'async_transform1',
+                          'async_transform2', 'sync_transform2'])
+        # Synchronous sections after the asynchronous ones stay in the
+        # calling thread
+        self.assertEqual(items[0]['thread'],
+                         threading.current_thread().name)
+
+    def testSyncSectionInSingleThread(self):
+        class Threads(Blueprint):
+            threads = set()
+
+            def __iter__(self):
+                for item in self.previous:
+                    self.threads.add(threading.current_thread())
+                    yield item
+        provideUtility(Threads, ISectionBlueprint,
+                       name='transmogrifier.tests.threads')
+        self._run('async_source', 'threads', 'async_transform', 'collect')
+        self.assertEqual(len(Threads.threads), 1)
+
+    def testErrorPropagation(self):
+        class Fail(AsyncBlueprint):
+            async def __aiter__(self):
+                async for item in aiterate(self.previous):
+                    raise ValueError(item['id'])
+                    yield item  # pragma: no cover
+        provideUtility(Fail, ISectionBlueprint,
+                       name='transmogrifier.tests.fail')
+        with self.assertRaises(ValueError):
+            self._run('async_source', 'fail', 'collect')
+
+
+class AsyncMapTests(unittest.TestCase):
+
+    def testOrderedWithConcurrency(self):
+        state = {'running': 0, 'max_running': 0}
+
+        async def fetch(i):
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+            await asyncio.sleep(0.01 * (5 - i % 5))
+            state['running'] -= 1
+            return i
+
+        async def items():
+            for i in range(20):
+                yield i
+
+        async def run():
+            return [i async for i in imap(fetch, items(), 4)]
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(run()), list(range(20)))
+        finally:
+            loop.close()
+        self.assertEqual(state['max_running'], 4)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+import sys
+import unittest
+
+
+def test_suite():
+    if sys.version_info < (3, 6):
+        return unittest.TestSuite()  # no asynchronous generators
+    from transmogrifier.tests import aio_cases
+    return unittest.findTestCases(aio_cases)
@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import io
 import logging
 import os
 import unittest
 import operator
+import time
 import doctest
 
 from transmogrifier import Transmogrifier
 from zope.interface import classImplements
 from zope.component import provideUtility
 from zope.configuration import xmlconfig
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.blueprints.expression import ExpressionSetter
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.interfaces import ISection
 from transmogrifier.registry import configuration_registry
@@ -17,6 +22,100 @@ from transmogrifier.testing import TransmogrifierLayer
 from zope.testing.loggingsupport import InstalledHandler
 
 
+class Collect(Blueprint):
+    """Append the items (or the values of their ``key``) to ``items`` or,
+    with ``named = true``, (section name, value) pairs
+    """
+    items = []
+
+    def __iter__(self):
+        key = self.options.get('key')
+        named = self.options.get('named') == 'true'
+        for item in self.previous:
+            value = item if key is None else item[key]
+            Collect.items.append((self.name, value) if named else value)
+            yield item
+
+
+class Slow(ConditionalBlueprint):
+    """Sleep ``seconds`` (0.01) before yielding the matching items"""
+    def __iter__(self):
+        seconds = float(self.options.get('seconds') or 0.01)
+        for item in self.previous:
+            if self.condition(item):
+                time.sleep(seconds)
+            yield item
+
+
+class Copy(ConditionalBlueprint):
+    """Yield copies of the matching items"""
+    def __iter__(self):
+        for item in self.previous:
+            yield dict(item) if self.condition(item) else item
+
+
+class Count(Blueprint):
+    """Set ``count`` of the items to their count from 1"""
+    def __iter__(self):
+        for count, item in enumerate(self.previous, 1):
+            item['count'] = count
+            yield item
+
+
+class CustomSetter(ExpressionSetter):
+    """Setter overriding ``__iter__`` to set ``custom`` of its items"""
+    def __iter__(self):
+        for item in super(CustomSetter, self).__iter__():
+            item['custom'] = True
+            yield item
+
+
+def register_blueprints(**blueprints):
+    """Register the blueprints of the tests by their names prefixed with
+    ``transmogrifier.tests.``
+    """
+    for name, blueprint in blueprints.items():
+        provideUtility(blueprint, ISectionBlueprint,
+                       name='transmogrifier.tests.' + name)
+
+
+class PipelineTestCase(unittest.TestCase):
+    """Test case running pipelines of its ``config``
+
+    The ``blueprints`` of the test case are registered and ``Collect.items``
+    is cleared before each test.
+
+    """
+
+    layer = TransmogrifierLayer
+
+    blueprints = {}
+    config = ''
+
+    def setUp(self):
+        Collect.items = []
+        register_blueprints(**self.blueprints)
+
+    def _register(self, name, **params):
+        """Register the config formatted with the parameters (and module
+        and tempdir) as the named pipeline of the test case and return its id
+        """
+        configuration_id = 'transmogrifier.tests.{0:s}.{1:s}'.format(
+            self.__class__.__name__, name)
+        params.setdefault('module', __name__)
+        params.setdefault('tempdir', self.layer.tempdir)
+        self.layer.registerConfiguration(configuration_id,
+                                         self.config.format(**params))
+        return configuration_id
+
+    def _transmogrify(self, configuration_id, **overrides):
+        """Run the pipeline with cleared ``Collect.items``"""
+        Collect.items = []
+        transmogrifier = Transmogrifier({})
+        transmogrifier(configuration_id, **overrides)
+        return transmogrifier
+
+
 class MetaDirectivesTests(unittest.TestCase):
 
     layer = TransmogrifierLayer
@@ -250,6 +349,1392 @@ class PackageReferenceResolverTest(unittest.TestCase):
                           'transmogrifier.nonexistent:test')
 
 
+class ExpressionCacheTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        from transmogrifier.expression import expression_cache
+        self.cache = expression_cache
+        self.cache.clear()
+
+    def _makeExpression(self, expression, name='section'):
+        from transmogrifier.expression import Expression
+        return Expression(expression, Transmogrifier({}), name, {})
+
+    def testSharedBetweenInstances(self):
+        from transmogrifier.condition import Condition
+        self.assertEqual(self._makeExpression('python:item + 1')(1), 2)
+        self.assertEqual(self._makeExpression('item + 1', 'other')(2), 3)
+        self.assertEqual(self.cache.info()['misses'], 1)
+        self.assertEqual(self.cache.info()['hits'], 1)
+        condition = Condition('python:item + 1', Transmogrifier({}),
+                              'section', {})
+        self.assertTrue(condition(1))
+        self.assertEqual(self.cache.info()['hits'], 2)
+
+    def testCompiledOncePerInstance(self):
+        expression = self._makeExpression('string:${item}')
+        for i in range(3):
+            self.assertEqual(expression(i), str(i))
+        self.assertEqual(self.cache.info()['misses'], 1)
+        self.assertEqual(self.cache.info()['hits'], 0)
+
+    def testLRUEviction(self):
+        from transmogrifier.expression import ExpressionCache
+        cache = ExpressionCache(maxsize=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: None)
+        cache.get('c', lambda: 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.info(),
+                         dict(hits=1, misses=3, size=2, maxsize=2))
+
+
+class NativeExpressionEngineTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeExpression(self, expression, engine='native'):
+        from transmogrifier.expression import Expression
+        tm = Transmogrifier({})
+        tm._data = {'transmogrifier': {'expression_engine': engine}}
+        return Expression(expression, tm, 'section', {})
+
+    def testNativePython(self):
+        from transmogrifier.expression import expression_cache
+        source = '[options, nothing, name] + [item for i in range(2)]'
+        expression = self._makeExpression('python:' + source)
+        self.assertEqual(expression(1), [{}, None, 'section', 1, 1])
+        self.assertEqual(expression(2, name='extra')[2], 'extra')
+        self.assertEqual(expression(3, name='again')[2:], ['again', 3, 3])
+        self.assertIn(('python', source, 'native', ()), expression_cache)
+        self.assertIn(('python', source, 'native', ('name',)),
+                      expression_cache)
+
+    def testFallbackToChameleon(self):
+        self.assertEqual(self._makeExpression('string:${item}')(1), '1')
+        self.assertEqual(self._makeExpression('python:item[1] | 2')({}), 2)
+
+    def testUnknownEngine(self):
+        self.assertRaises(AssertionError, self._makeExpression,
+                          'python:True', 'unknown')
+
+
+class BytecodeCacheTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        from transmogrifier.expression import expression_cache
+        self.directory = os.path.join(self.layer.tempdir, 'cache')
+        self.cache = expression_cache
+        self.cache.clear()
+
+    def _makeExpression(self, expression):
+        from transmogrifier.expression import Expression
+        tm = Transmogrifier({})
+        tm._data = {'transmogrifier': {'expression_cache': self.directory}}
+        return Expression(expression, tm, 'section', {})
+
+    def testCodeReusedFromDisk(self):
+        from transmogrifier import expression
+        self.assertEqual(self._makeExpression('string:${item}')(1), '1')
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        self.cache.clear()
+        compile_code = expression.compile_code
+        expression.compile_code = None  # must not be called
+        try:
+            self.assertEqual(self._makeExpression('string:${item}')(2), '2')
+        finally:
+            expression.compile_code = compile_code
+
+    def testInvalidatedByVersions(self):
+        from transmogrifier.expression import BytecodeCache
+        from transmogrifier.expression import BYTECODE_CACHE_VERSIONS
+        cache = BytecodeCache(self.directory)
+        self.assertIs(cache.versions, BYTECODE_CACHE_VERSIONS)
+        path = cache.get_path(('python', 'True'))
+        cache.versions += ('upgraded',)
+        self.assertNotEqual(path, cache.get_path(('python', 'True')))
+
+
+class ConditionFoldingTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeCondition(self, expression):
+        from transmogrifier.condition import Condition
+        return Condition(expression, Transmogrifier({}), 'section', {})
+
+    def testConstants(self):
+        self.assertIs(self._makeCondition('python:True').constant, True)
+        self.assertIs(self._makeCondition(' 1 ').constant, True)
+        self.assertIs(self._makeCondition('python: False').constant, False)
+        self.assertIs(self._makeCondition('python:None').constant, False)
+        self.assertIs(self._makeCondition('python:False')(None), False)
+
+    def testNonConstants(self):
+        for expression in ['python:item', 'string:True', 'python:True | 0',
+                           'not:True', 'python:bool(1)']:
+            self.assertIsNone(self._makeCondition(expression).constant)
+        self.assertIs(self._makeCondition('python:item')(1), True)
+
+    def testDefaultCondition(self):
+        blueprint = ConditionalBlueprint(Transmogrifier({}), 'section', {},
+                                         iter(()))
+        self.assertIs(blueprint.condition.constant, True)
+
+    def testConstantFalseNotCalled(self):
+        from transmogrifier.condition import Condition
+        config = """\
+[transmogrifier]
+pipeline =
+    source
+    set
+    transform
+    wrap
+    delete
+    interval
+    logger
+    breakpoint
+    csv
+    jsonl
+    fingerprint
+    more
+    record
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i}} for i in range(3)]
+
+[set]
+blueprint = transmogrifier.set
+condition = python:False
+x = 1
+
+[transform]
+blueprint = transmogrifier.transform
+condition = python:False
+expression = python:1 / 0
+
+[wrap]
+blueprint = transmogrifier.wrap
+condition = python:False
+key = wrapped
+
+[delete]
+blueprint = transmogrifier.del
+condition = python:False
+keys = id
+
+[interval]
+blueprint = transmogrifier.interval
+condition = python:False
+expression = python:1 / 0
+
+[logger]
+blueprint = transmogrifier.logger
+condition = python:False
+level = INFO
+
+[breakpoint]
+blueprint = transmogrifier.breakpoint
+condition = python:False
+
+[csv]
+blueprint = transmogrifier.to_csv
+condition = python:False
+filename = {tempdir:s}/constant.csv
+
+[jsonl]
+blueprint = transmogrifier.to_jsonl
+condition = python:False
+filename = {tempdir:s}/constant.jsonl
+
+[fingerprint]
+blueprint = transmogrifier.fingerprint
+condition = python:False
+filename = {tempdir:s}/constant.db
+
+[more]
+blueprint = transmogrifier.from
+condition = python:False
+expression = [{{'id': 3}}]
+
+[record]
+blueprint = transmogrifier.transform
+expression = python:modules['{module:s}'].ConditionFoldingTests.items.append(
+    item)
+"""
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.condition.false', config.format(
+                tempdir=self.layer.tempdir, module=__name__))
+
+        def fail(condition, item, **extras):
+            raise AssertionError('Condition called')
+
+        call = Condition.__call__
+        Condition.__call__ = fail
+        try:
+            for fusion, batch_size in [('false', ''), ('true', ''),
+                                       ('true', '2')]:
+                ConditionFoldingTests.items = []
+                Transmogrifier({})('transmogrifier.tests.condition.false',
+                                   transmogrifier={'fusion': fusion,
+                                                   'batch_size': batch_size})
+                self.assertEqual(ConditionFoldingTests.items,
+                                 [{'id': 0}, {'id': 1}, {'id': 2}])
+        finally:
+            Condition.__call__ = call
+
+
+class CSVSourceTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        import csv
+        import io
+        self.path = os.path.join(self.layer.tempdir, 'input.csv')
+        with io.open(self.path, 'w', newline='', encoding='utf-8') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['id', 'text'])
+            for i in range(100):
+                writer.writerow([str(i), ['plain', 'with "quotes"',
+                                          'multi\nline "\n"', ''][i % 4]])
+        with io.open(self.path, newline='', encoding='utf-8') as fp:
+            self.expected = list(csv.DictReader(fp))
+
+    def _parse(self, **options):
+        from transmogrifier.blueprints.data import CSVSource
+        options.update(filename=self.path)
+        return list(CSVSource(Transmogrifier({}), 'source', options,
+                              iter(())))
+
+    def testParallelOrdered(self):
+        self.assertEqual(self._parse(workers='2', chunk_size='64'),
+                         self.expected)
+
+    def testParallelUnordered(self):
+        rows = self._parse(workers='2', chunk_size='64', ordered='false')
+        self.assertEqual(sorted(rows, key=lambda row: int(row['id'])),
+                         self.expected)
+
+    def testSkipAndLimit(self):
+        self.assertEqual(self._parse(skip='10', limit='5'),
+                         self.expected[10:15])
+        self.assertEqual(self._parse(skip='95'), self.expected[95:])
+
+    def testCompression(self):
+        from transmogrifier.blueprints.data import CSVConstructor
+        for extension in ['.gz', '.bz2', '.xz']:
+            path = os.path.join(self.layer.tempdir, 'output.csv' + extension)
+            constructor = CSVConstructor(
+                Transmogrifier({}), 'constructor',
+                {'filename': path, 'compression_level': '1'},
+                iter(self.expected))
+            self.assertEqual(list(constructor), self.expected)
+            with open(path, 'rb') as fp:
+                data = fp.read()
+            self.assertNotIn(b'plain', data)
+            if extension == '.gz':  # original filename in the header
+                self.assertEqual(data[10:data.index(b'\0', 10)],
+                                 b'output.csv')
+
+            self.path = path
+            self.assertEqual(self._parse(workers='2', index='true'),
+                             self.expected)
+
+        path = os.path.join(self.layer.tempdir, 'output.data')
+        list(CSVConstructor(Transmogrifier({}), 'constructor',
+                            {'filename': path, 'compression': 'gzip'},
+                            iter(self.expected)))
+        self.path = path
+        self.assertEqual(self._parse(compression='gzip', skip='99'),
+                         self.expected[99:])
+
+    def testIndex(self):
+        from transmogrifier.blueprints.data import CSVIndex
+        self.assertEqual(self._parse(index='true', index_every='7',
+                                     skip='22', limit='3'),
+                         self.expected[22:25])
+        index = CSVIndex.load(self.path + '.idx', self.path, 7, b'"')
+        self.assertEqual(len(index.offsets), 15)
+        self.assertEqual(self._parse(index='true', index_every='7',
+                                     workers='2', chunk_size='64',
+                                     skip='50'),
+                         self.expected[50:])
+
+        os.utime(self.path, (0, 0))  # invalidates index
+        self.assertIsNone(
+            CSVIndex.load(self.path + '.idx', self.path, 7, b'"'))
+        self.assertEqual(self._parse(index='true', index_every='7',
+                                     skip='99'),
+                         self.expected[99:])
+        self.assertIsNotNone(
+            CSVIndex.load(self.path + '.idx', self.path, 7, b'"'))
+
+    def testIndexBlankLines(self):
+        import io
+        with io.open(self.path, newline='', encoding='utf-8') as fp:
+            data = fp.read()
+        with io.open(self.path, 'w', newline='', encoding='utf-8') as fp:
+            fp.write(data.replace('\r\n9,', '\r\n\r\n\n9,', 1))
+        for options in [{}, {'index': 'true', 'index_every': '4'},
+                        {'index': 'true', 'index_every': '1'},
+                        {'workers': '2', 'chunk_size': '64'}]:
+            self.assertEqual(self._parse(skip='10', limit='3', **options),
+                             self.expected[10:13])
+            self.assertEqual(self._parse(skip='95', **options),
+                             self.expected[95:])
+
+
+class CSVConstructorTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        self.path = os.path.join(self.layer.tempdir, 'output.csv')
+        with open(self.path, 'w') as fp:
+            fp.write('previous\n')
+
+    def _construct(self, items, **options):
+        from transmogrifier.blueprints.data import CSVConstructor
+        options.update(filename=self.path)
+        return iter(CSVConstructor(Transmogrifier({}), 'constructor',
+                                   options, items))
+
+    def _temporary(self):
+        return [name for name in os.listdir(self.layer.tempdir)
+                if name.endswith('.tmp')]
+
+    def _read(self, path=None):
+        with io.open(path or self.path, newline='') as fp:
+            return fp.read()
+
+    def testCompleted(self):
+        self.assertEqual(len(list(self._construct(iter([{'id': '1'}])))), 1)
+        self.assertEqual(self._read(), 'id\r\n1\r\n')
+        self.assertEqual(self._temporary(), [])
+
+    def testFailure(self):
+        def items():
+            yield {'id': '1'}
+            raise ValueError('failure')
+
+        constructor = self._construct(items())
+        self.assertEqual(next(constructor), {'id': '1'})
+        self.assertEqual(len(self._temporary()), 1)
+        self.assertRaises(ValueError, next, constructor)
+        self.assertEqual(self._read(), 'previous\n')
+        self.assertEqual(self._temporary(), [])
+
+    def testClosedEarly(self):
+        constructor = self._construct(iter([{'id': '1'}, {'id': '2'}]))
+        self.assertEqual(next(constructor), {'id': '1'})
+        constructor.close()
+        self.assertEqual(self._read(), 'previous\n')
+        self.assertEqual(self._temporary(), [])
+
+    def testFlushInterval(self):
+        def items():
+            for i in range(3):
+                time.sleep(0.02)
+                yield {'id': str(i)}
+
+        constructor = self._construct(items())
+        next(constructor)
+        next(constructor)
+        temporary = os.path.join(self.layer.tempdir, self._temporary()[0])
+        self.assertEqual(self._read(temporary), '')  # buffered
+        constructor.close()
+
+        constructor = self._construct(items(), flush_interval='0.01')
+        next(constructor)
+        next(constructor)
+        self.assertEqual(self._temporary(), [])  # written directly
+        self.assertEqual(self._read(), 'id\r\n0\r\n1\r\n')
+        self.assertEqual(len(list(constructor)), 1)
+        self.assertEqual(self._read(), 'id\r\n0\r\n1\r\n2\r\n')
+
+
+class PrefetchTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def testEarlyTermination(self):
+        import threading
+        from transmogrifier.blueprints.prefetch import Prefetch
+        closed = []
+
+        def source():
+            try:
+                for i in range(1000):
+                    yield {'id': i}
+            finally:
+                closed.append(True)
+
+        prefetch = Prefetch(Transmogrifier({}), 'prefetch', {'size': '5'},
+                            source())
+        iterator = iter(prefetch)
+        self.assertEqual(next(iterator), {'id': 0})
+        iterator.close()
+        self.assertEqual(closed, [True])
+        self.assertEqual(prefetch.stats['items'], 1)
+        self.assertNotIn('transmogrifier:prefetch',
+                         [thread.name for thread in threading.enumerate()])
+
+
+class ParallelTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _run(self, batch_size='', **options):
+        from transmogrifier.blueprints.pipeline import Parallel
+        transmogrifier = Transmogrifier({})
+        transmogrifier._data = {
+            'transmogrifier': {'batch_size': batch_size},
+            'transform': {'blueprint': 'transmogrifier.set',
+                          'square': "item['id'] ** 2"},
+            'fail': {'blueprint': 'transmogrifier.set',
+                     'square': "item['square'] // (item['id'] - 1)"},
+            'count': {'blueprint': 'transmogrifier.tests.count'},
+            'exit': {'blueprint': 'transmogrifier.transform',
+                     'expression': "python:item['id'] == 4 and "
+                                   "__import__('os')._exit(3)"}}
+        options.setdefault('pipeline', 'transform')
+        options.setdefault('workers', '2')
+        options.update(chunk_size='3')
+        return list(Parallel(transmogrifier, 'parallel', options,
+                             iter([{'id': i} for i in range(20)])))
+
+    def testOrdered(self):
+        self.assertEqual(self._run(),
+                         [{'id': i, 'square': i ** 2} for i in range(20)])
+
+    def testUnordered(self):
+        items = self._run(ordered='false')
+        self.assertEqual(sorted(items, key=lambda item: item['id']),
+                         [{'id': i, 'square': i ** 2} for i in range(20)])
+
+    def testBatches(self):
+        self.assertEqual(self._run(batch_size='2'),
+                         [{'id': i, 'square': i ** 2} for i in range(20)])
+
+    def testSubPipelineBuiltOnce(self):
+        register_blueprints(count=Count)
+        self.assertEqual(self._run(pipeline='count', workers='1'),
+                         [{'id': i, 'count': i + 1} for i in range(20)])
+
+    def testError(self):
+        from transmogrifier.parallel import RemoteError
+        with self.assertRaises(RemoteError) as context:
+            self._run(pipeline='transform\nfail')
+        self.assertIn("{'id': 1", str(context.exception))
+        self.assertIn('in run', str(context.exception))  # worker traceback
+
+    def testBatchError(self):
+        from transmogrifier.parallel import RemoteError
+        with self.assertRaises(RemoteError) as context:
+            self._run(batch_size='2', pipeline='transform\nfail')
+        self.assertIn("while processing item:\n[{'id': 0",
+                      str(context.exception))  # the failed chunk
+        self.assertIn("{'id': 1", str(context.exception))
+
+    def testPartitioned(self):
+        items = self._run(partition="python:item['id'] % 3")
+        self.assertEqual(sorted(items, key=lambda item: item['id']),
+                         [{'id': i, 'square': i ** 2} for i in range(20)])
+        for key in range(3):
+            self.assertEqual([item['id'] for item in items
+                              if item['id'] % 3 == key],
+                             list(range(key, 20, 3)))
+
+    def testPartitionedError(self):
+        from transmogrifier.parallel import RemoteError
+        with self.assertRaises(RemoteError) as context:
+            self._run(partition="python:item['id'] % 3",
+                      pipeline='transform\nfail')
+        self.assertIn("{'id': 1", str(context.exception))
+
+    def testPartitionExited(self):
+        from transmogrifier.blueprints.pipeline import SectionError
+        with self.assertRaises(SectionError) as context:
+            self._run(partition="python:item['id'] % 3",
+                      pipeline='transform\nexit')
+        self.assertIn('partition 1 exited with code 3',
+                      str(context.exception))
+
+    def testGetPartitionIsStable(self):
+        from transmogrifier.blueprints.pipeline import get_partition
+        self.assertEqual(get_partition('folder', 4), 1)
+        self.assertEqual(get_partition(b'folder', 4), 1)
+
+
+class BatchTests(PipelineTestCase):
+
+    blueprints = {'collect': Collect}
+
+    config = """\
+[transmogrifier]
+batch_size = {batch_size:s}
+pipeline =
+    source
+    set
+    filter
+    wrap
+    invert
+    delete
+    interval
+    collect
+    constructor
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i, 'title': 'Item %d' % i}} for i in range(20)]
+
+[set]
+blueprint = transmogrifier.set
+double = item['id'] * 2
+condition = item['id'] % 3
+
+[filter]
+blueprint = transmogrifier.filter.or
+small = item['id'] < 5
+large = item['id'] > 10
+
+[wrap]
+blueprint = transmogrifier.wrap
+key = wrapped
+
+[invert]
+blueprint = transmogrifier.invert
+key = wrapped
+
+[delete]
+blueprint = transmogrifier.del
+keys = title
+
+[interval]
+blueprint = transmogrifier.interval
+interval = 4
+count = python:modules['{module:s}'].BatchTests.intervals.append(1)
+
+[collect]
+blueprint = transmogrifier.tests.collect
+
+[constructor]
+blueprint = transmogrifier.to_jsonl
+filename = {filename:s}
+"""
+
+    def _run(self, batch_size):
+        BatchTests.intervals = []
+        filename = os.path.join(self.layer.tempdir, 'output.jsonl')
+        self._transmogrify(self._register(
+            batch_size or 'disabled', batch_size=batch_size,
+            filename=filename))
+        with open(filename) as fp:
+            return Collect.items, len(BatchTests.intervals), fp.read()
+
+    def testSameResultsWithBatches(self):
+        expected = self._run('')
+        self.assertEqual(len(expected[0]), 14)
+        self.assertEqual(expected[1], 4)
+        for batch_size in ['1', '3', '100']:
+            self.assertEqual(self._run(batch_size), expected)
+
+    def testBatchIterator(self):
+        from transmogrifier.batch import BatchIterator
+        from transmogrifier.batch import iter_batches
+        from transmogrifier.interfaces import ISectionBatch
+
+        class Section(object):
+            def iter_batches(self):
+                yield [1, 2]
+                yield [3]
+
+        self.assertEqual(list(BatchIterator(Section())), [1, 2, 3])
+        iterator = BatchIterator(Section())
+        self.assertTrue(ISectionBatch.providedBy(iterator))
+        self.assertEqual(list(iter_batches(iterator, 10)), [[1, 2], [3]])
+        self.assertEqual(list(iter_batches(iter(range(5)), 2)),
+                         [[0, 1], [2, 3], [4]])
+
+    def testOverriddenIter(self):
+        from transmogrifier.batch import is_batch_section
+        from transmogrifier.batch import iter_batches
+        from transmogrifier.utils import get_section
+        transmogrifier = Transmogrifier({})
+        transmogrifier._data = {'transmogrifier': {'batch_size': '10'}}
+        options = {'blueprint': 'transmogrifier.set', 'x': 'python:1'}
+        section = ExpressionSetter(transmogrifier, 'set', options,
+                                   iter([{'id': 1}]))
+        self.assertTrue(is_batch_section(section))
+        self.assertEqual(list(iter_batches(section, 10)),
+                         [[{'id': 1, 'x': 1}]])
+
+        section = CustomSetter(transmogrifier, 'set', options,
+                               iter([{'id': 1}]))
+        self.assertFalse(is_batch_section(section))
+        self.assertIs(get_section(transmogrifier, section, None, 'set'),
+                      section)
+        self.assertEqual(list(iter_batches(section, 10)),
+                         [[{'id': 1, 'x': 1, 'custom': True}]])
+
+
+class FusionTests(PipelineTestCase):
+
+    blueprints = {'collect': Collect}
+
+    config = """\
+[transmogrifier]
+fusion = {fusion:s}
+pipeline =
+    source
+    set
+    filter
+    transform
+    collect
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i}} for i in range(4)]
+
+[set]
+blueprint = transmogrifier.set
+condition = python:modules['{module:s}'].FusionTests.calls.append(
+    ('set:condition', item['id'])) or True
+value = python:modules['{module:s}'].FusionTests.calls.append(
+    ('set', item['id'])) or item['id']
+
+[filter]
+blueprint = transmogrifier.filter.or
+a = python:modules['{module:s}'].FusionTests.calls.append(
+    ('filter:a', item['id'])) or item['id'] % 2
+b = python:modules['{module:s}'].FusionTests.calls.append(
+    ('filter:b', item['id'])) or item['id'] == 0
+
+[transform]
+blueprint = transmogrifier.transform
+expression = python:modules['{module:s}'].FusionTests.calls.append(
+    ('transform', item['id']))
+
+[collect]
+blueprint = transmogrifier.tests.collect
+key = id
+named = true
+"""
+
+    def _run(self, fusion):
+        Collect.items = FusionTests.calls = []
+        configuration_id = self._register(fusion, fusion=fusion)
+        transmogrifier = Transmogrifier({})
+        self.assertEqual(
+            [len(group) for group in transmogrifier.plan(configuration_id)],
+            fusion == 'true' and [1, 3, 1] or [1, 1, 1, 1, 1])
+        transmogrifier(configuration_id)
+        return FusionTests.calls
+
+    def testSameEvaluationOrder(self):
+        expected = self._run('false')
+        self.assertEqual(expected[:7], [
+            ('set:condition', 0), ('set', 0),
+            ('filter:a', 0), ('filter:b', 0),
+            ('transform', 0), ('collect', 0),
+            ('set:condition', 1),
+        ])
+        self.assertNotIn(('transform', 2), expected)
+        self.assertEqual(self._run('true'), expected)
+
+    def testOverriddenIter(self):
+        from transmogrifier.utils import is_fusable
+        register_blueprints(customset=CustomSetter)
+        self.assertTrue(is_fusable(ExpressionSetter))
+        self.assertFalse(is_fusable(CustomSetter))
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.fusion.overridden', """\
+[transmogrifier]
+pipeline =
+    source
+    set
+    custom
+    delete
+    record
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': 1}}]
+
+[set]
+blueprint = transmogrifier.set
+x = 1
+
+[custom]
+blueprint = transmogrifier.tests.customset
+y = 2
+
+[delete]
+blueprint = transmogrifier.del
+keys = y
+
+[record]
+blueprint = transmogrifier.transform
+expression = python:modules['{module:s}'].FusionTests.calls.append(
+    dict(item))
+""".format(module=__name__))
+        transmogrifier = Transmogrifier({})
+        self.assertEqual(
+            [[entry[0] for entry in group] for group in
+             transmogrifier.plan('transmogrifier.tests.fusion.overridden')],
+            [['source'], ['set'], ['custom'], ['delete', 'record']])
+        for batch_size in ['', '10']:
+            FusionTests.calls = []
+            transmogrifier('transmogrifier.tests.fusion.overridden',
+                           transmogrifier={'batch_size': batch_size})
+            self.assertEqual(FusionTests.calls,
+                             [{'id': 1, 'x': 1, 'custom': True}])
+
+    def testWrapWithoutKey(self):
+        for fusion in ['false', 'true']:
+            FusionTests.calls = []
+            configuration_id = 'transmogrifier.tests.fusion.wrap.' + fusion
+            self.layer.registerConfiguration(configuration_id, """\
+[transmogrifier]
+fusion = {fusion:s}
+pipeline =
+    source
+    wrap
+    delete
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i}} for i in range(2)]
+
+[wrap]
+blueprint = transmogrifier.wrap
+condition = python:modules['{module:s}'].FusionTests.calls.append(
+    item['id'])
+
+[delete]
+blueprint = transmogrifier.del
+keys = id
+""".format(fusion=fusion, module=__name__))
+            Transmogrifier({})(configuration_id)
+            self.assertEqual(FusionTests.calls, [0, 1])
+
+
+class StatsTests(PipelineTestCase):
+
+    blueprints = {'slow': Slow}
+
+    config = """\
+[transmogrifier]
+stats = {stats:s}
+batch_size = {batch_size:s}
+pipeline =
+    source
+    slow
+    set
+    delete
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i}} for i in range(10)]
+
+[slow]
+blueprint = transmogrifier.tests.slow
+
+[set]
+blueprint = transmogrifier.set
+condition = item['id'] % 2
+odd = True
+
+[delete]
+blueprint = transmogrifier.del
+keys = odd
+"""
+
+    def _run(self, stats, batch_size=''):
+        return self._transmogrify(self._register(
+            '{0:s}.{1:s}'.format(stats, batch_size or 'disabled'),
+            stats=stats, batch_size=batch_size))
+
+    def testDisabled(self):
+        transmogrifier = self._run('false')
+        self.assertEqual(transmogrifier.meters, [])
+        self.assertIsNone(transmogrifier.stats)
+
+    def testExclusiveTime(self):
+        stats = self._run('true').stats
+        sections = dict([(section['section'], section)
+                         for section in stats['sections']])
+        self.assertEqual(
+            [section['section'] for section in stats['sections']],
+            ['source', 'slow', 'set+delete'])
+        self.assertGreaterEqual(sections['slow']['exclusive'], 0.1)
+        self.assertLess(sections['set+delete']['exclusive'], 0.05)
+        self.assertGreaterEqual(sections['set+delete']['inclusive'], 0.1)
+        self.assertEqual(sections['set+delete']['items_in'], 10)
+        self.assertEqual(sections['set+delete']['evaluated'], 10)
+        self.assertEqual(sections['set+delete']['passed'], 5)
+
+    def testBatches(self):
+        expected = [(section['section'], section['items_in'],
+                     section['items_out'], section['passed'])
+                    for section in self._run('true').stats['sections']]
+        self.assertEqual(
+            [(section['section'], section['items_in'],
+              section['items_out'], section['passed'])
+             for section in self._run('true', '4').stats['sections']],
+            expected)
+
+
+class GenerateSourceTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    fields = """
+        id = sequence
+        title = text 5-8
+        score = float -1-1 null=0.5
+        owner.name = text cardinality=3
+        owner.state = choice a b
+    """
+
+    def _generate(self, **options):
+        from transmogrifier.blueprints.generate import GenerateSource
+        options.setdefault('fields', self.fields)
+        return list(GenerateSource(Transmogrifier({}), 'source', options,
+                                   iter(())))
+
+    def testSchema(self):
+        items = self._generate(count='1000', period='100')
+        self.assertEqual([item['id'] for item in items], list(range(1000)))
+        for item in items:
+            self.assertTrue(5 <= len(item['title']) <= 8)
+            self.assertTrue(item['score'] is None or
+                            -1 <= item['score'] <= 1)
+            self.assertIn(item['owner']['state'], ['a', 'b'])
+        self.assertLessEqual(
+            len(set([item['owner']['name'] for item in items])), 3)
+        self.assertIn(None, [item['score'] for item in items])
+        self.assertEqual(items[100]['title'], items[0]['title'])
+        self.assertIsNot(items[100]['owner'], items[0]['owner'])
+
+    def testSeed(self):
+        self.assertEqual(self._generate(seed='1'), self._generate(seed='1'))
+        self.assertNotEqual(self._generate(seed='1'),
+                            self._generate(seed='2'))
+
+    def testConflictingFields(self):
+        self.assertRaises(AssertionError, self._generate,
+                          fields='owner = int 1-2\nowner.id = int 1-2')
+
+
+class CheckpointTests(PipelineTestCase):
+
+    blueprints = {'collect': Collect}
+
+    config = """\
+[transmogrifier]
+pipeline =
+    source
+    fail
+    collect
+checkpoint = {checkpoint:s}
+checkpoint_interval = 0
+checkpoint_key = id
+batch_size = {batch_size:s}
+
+[source]
+blueprint = transmogrifier.generate
+count = 100
+fields =
+    id = sequence
+
+[fail]
+blueprint = transmogrifier.transform
+expression = python:item['id'] == 60 and 1 / 0
+
+[collect]
+blueprint = transmogrifier.tests.collect
+key = id
+"""
+
+    def _run(self, batch_size):
+        import json
+        path = os.path.join(self.layer.tempdir, 'checkpoint.json')
+        configuration_id = self._register(
+            batch_size or 'disabled', checkpoint=path, batch_size=batch_size)
+
+        self.assertRaises(ZeroDivisionError,
+                          self._transmogrify, configuration_id)
+        self.assertEqual(Collect.items, list(range(60)))
+        with open(path) as fp:
+            checkpoint = json.load(fp)[configuration_id]
+        self.assertEqual(checkpoint['positions'], {'source': 60})
+        self.assertEqual(checkpoint['key'], 59)
+        self.assertFalse(checkpoint['complete'])
+
+        self._transmogrify(configuration_id,
+                           transmogrifier={'resume': 'true'},
+                           fail={'expression': 'python:None'})
+        self.assertEqual(Collect.items, list(range(60, 100)))
+        with open(path) as fp:
+            checkpoint = json.load(fp)[configuration_id]
+        self.assertEqual(checkpoint['positions'], {'source': 100})
+        self.assertTrue(checkpoint['complete'])
+
+        self._transmogrify(configuration_id,
+                           transmogrifier={'resume': 'true'})
+        self.assertEqual(Collect.items, [])
+
+        self._transmogrify(configuration_id,
+                           fail={'expression': 'python:None'})
+        self.assertEqual(Collect.items, list(range(100)))
+
+    def testResume(self):
+        self._run('')
+
+    def testResumeBatches(self):
+        self._run('10')
+
+    def testUpdateUntrackedItem(self):
+        from transmogrifier.checkpoint import Checkpoint
+        checkpoint = Checkpoint(os.path.join(self.layer.tempdir,
+                                             'untracked.json'))
+        for item in checkpoint.track('source', ({'id': i}
+                                                for i in range(10))):
+            pass
+        del item
+        # New items may get the ids of the released ones
+        self.assertEqual([checkpoint.update({'id': i}) for i in range(10)],
+                         [False] * 10)
+
+    def testCSVResume(self):
+        import csv
+        import io
+        from transmogrifier.blueprints.data import CSVSource
+        from transmogrifier.checkpoint import Checkpoint
+        path = os.path.join(self.layer.tempdir, 'resume.csv')
+        with io.open(path, 'w', newline='', encoding='utf-8') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['id'])
+            for i in range(10):
+                writer.writerow([str(i)])
+        transmogrifier = Transmogrifier({})
+        transmogrifier.checkpoint = Checkpoint(
+            os.path.join(self.layer.tempdir, 'resume.json'))
+        transmogrifier.checkpoint.positions['source'] = 7
+        source = CSVSource(transmogrifier, 'source',
+                           {'filename': path, 'skip': '1', 'limit': '8'},
+                           iter(()))
+        self.assertEqual([row['id'] for row in source], ['8'])
+
+
+class FingerprintTests(PipelineTestCase):
+
+    blueprints = {'collect': Collect, 'copy': Copy}
+
+    config = """\
+[transmogrifier]
+pipeline =
+    source
+    fingerprint
+    fail
+    copy
+    collect
+batch_size = {batch_size:s}
+
+[source]
+blueprint = transmogrifier.from
+expression = python:[{{'_path': '/%d' % i, 'id': i, 'title': 'a'}}
+                     for i in range(10)]
+
+[fingerprint]
+blueprint = transmogrifier.fingerprint
+filename = {filename:s}
+keys = title
+
+[fail]
+blueprint = transmogrifier.transform
+expression = python:None
+
+[copy]
+blueprint = transmogrifier.tests.copy
+condition = {copy:s}
+
+[collect]
+blueprint = transmogrifier.tests.collect
+key = id
+"""
+
+    def _run(self, batch_size, copy='python:False'):
+        name = '{0:s}-{1:s}'.format(batch_size or 'disabled',
+                                    str(copy != 'python:False'))
+        filename = os.path.join(self.layer.tempdir,
+                                'fingerprints{0:s}.db'.format(name))
+        configuration_id = self._register(
+            name, filename=filename, batch_size=batch_size, copy=copy)
+
+        def run(changed=(), fail=None):
+            overrides = {'source': {'expression': (
+                "python:[{{'_path': '/%d' % i, 'id': i, "
+                "'title': i in {0!r} and 'b' or 'a'}} "
+                "for i in range(10)]".format(list(changed)))}}
+            if fail is not None:
+                overrides['fail'] = {
+                    'expression': "python:item['id'] == {0:d} and 1 / 0"
+                                  .format(fail)}
+            self._transmogrify(configuration_id, **overrides)
+            return Collect.items
+
+        self.assertEqual(run(), list(range(10)))
+        self.assertEqual(run(), [])
+        self.assertEqual(run(changed=[3, 7]), [3, 7])
+        self.assertEqual(run(changed=[3, 7]), [])
+        self.assertRaises(ZeroDivisionError, run, changed=[2, 3, 5, 7, 8],
+                          fail=5)
+        self.assertEqual(Collect.items, [2])
+        self.assertEqual(run(changed=[2, 3, 5, 7, 8]), [5, 8])
+
+    def testFingerprint(self):
+        self._run('')
+
+    def testFingerprintBatches(self):
+        self._run('4')
+
+    def testFingerprintCopies(self):
+        self._run('', copy='python:True')
+        self._run('4', copy="python:item['id'] % 2")
+
+    def testGetFingerprint(self):
+        from transmogrifier.blueprints.fingerprint import get_fingerprint
+        import datetime
+        self.assertEqual(get_fingerprint({'a': [1], 'b': 2}, []),
+                         get_fingerprint({'b': 2, 'a': [1], '_c': 3}, []))
+        self.assertNotEqual(get_fingerprint({'a': 1, 'b': 1}, []),
+                            get_fingerprint({'a': 1, 'b': 2}, []))
+        self.assertEqual(get_fingerprint({'a': 1, 'b': 1}, ['a']),
+                         get_fingerprint({'a': 1, 'b': 2}, ['a']))
+        self.assertNotEqual(
+            get_fingerprint({'a': datetime.date(2000, 1, 1)}, []),
+            get_fingerprint({'a': datetime.date(2000, 1, 2)}, []))
+
+
+class JobsTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    config = """\
+[transmogrifier]
+pipeline =
+    source
+    transform
+    jsonl
+depends = {depends:s}
+stats = true
+
+[source]
+blueprint = transmogrifier.generate
+count = 10
+fields =
+    id = sequence
+
+[transform]
+blueprint = transmogrifier.transform
+expression = python:{expression:s}
+
+[jsonl]
+blueprint = transmogrifier.to_jsonl
+filename = {filename:s}
+"""
+
+    def _register(self, name, depends='', expression='None'):
+        configuration_id = 'transmogrifier.tests.jobs.' + name
+        self.layer.registerConfiguration(
+            configuration_id, self.config.format(
+                depends=depends, expression=expression,
+                filename=os.path.join(self.layer.tempdir, name + '.jsonl')))
+        return configuration_id
+
+    def testRunJobs(self):
+        from transmogrifier.jobs import run_jobs
+        a = self._register('run.a')
+        b = self._register('run.b', depends=a)
+        c = self._register('run.c', expression='1 / 0')
+        d = self._register('run.d', depends=c)
+        results = run_jobs([d, c, b, a], 2, {}, {})
+        self.assertEqual([(pipeline, success)
+                          for pipeline, success, result in results],
+                         [(d, False), (c, False), (b, True), (a, True)])
+        self.assertIn('ZeroDivisionError', str(results[1][2]))
+        self.assertEqual(results[2][2]['sections'][0]['items_out'], 10)
+        for name, exists in [('a', True), ('b', True), ('c', False),
+                             ('d', False)]:
+            self.assertEqual(os.path.exists(os.path.join(
+                self.layer.tempdir, 'run.{0:s}.jsonl'.format(name))), exists)
+
+    def testParallelSections(self):
+        from transmogrifier.jobs import run_jobs
+        pipelines = []
+        for name in ['parallel.a', 'parallel.b']:
+            configuration_id = 'transmogrifier.tests.jobs.' + name
+            self.layer.registerConfiguration(configuration_id, """\
+[transmogrifier]
+pipeline =
+    source
+    parallel
+    jsonl
+
+[source]
+blueprint = transmogrifier.generate
+count = 10
+fields =
+    id = sequence
+
+[parallel]
+blueprint = transmogrifier.parallel
+workers = 2
+pipeline =
+    transform
+
+[transform]
+blueprint = transmogrifier.set
+square = python:item['id'] ** 2
+
+[jsonl]
+blueprint = transmogrifier.to_jsonl
+filename = {0:s}
+""".format(os.path.join(self.layer.tempdir, name + '.jsonl')))
+            pipelines.append(configuration_id)
+        results = run_jobs(pipelines, 2, {}, {})
+        self.assertEqual([success for pipeline, success, result in results],
+                         [True, True], results)
+        with open(os.path.join(self.layer.tempdir, 'parallel.b.jsonl')) as fp:
+            self.assertEqual(len(fp.readlines()), 10)
+
+    def testExitedJob(self):
+        from transmogrifier.jobs import run_jobs
+        a = self._register('exited.a', expression='__import__("os")._exit(3)')
+        b = self._register('exited.b', depends=a)
+        results = run_jobs([a, b], 2, {}, {})
+        self.assertEqual([success for pipeline, success, result in results],
+                         [False, False])
+        self.assertIn('exited with code 3', str(results[0][2]))
+
+    def testProfileJobs(self):
+        from transmogrifier.jobs import run_jobs
+        from transmogrifier.profiler import SamplingProfiler
+        a = self._register('profile.a', expression='__import__("time")'
+                                                   '.sleep(0.01)')
+        profiler = SamplingProfiler()
+        results = run_jobs([a], 2, {}, {}, profiler)
+        self.assertTrue(results[0][1])
+        self.assertEqual(results[0][2]['sections'][0]['items_out'], 10)
+        self.assertTrue(profiler.samples)
+        for stack in profiler.samples:
+            self.assertTrue(stack.startswith(a + ';MainThread;'))
+        self.assertIn('transform (transmogrifier.transform)',
+                      ';'.join(profiler.samples))
+
+    def testCircularDependencies(self):
+        from transmogrifier.jobs import run_jobs
+        a = self._register('circular.a', depends='transmogrifier.tests.'
+                                                 'jobs.circular.b')
+        b = self._register('circular.b', depends=a)
+        self.assertRaises(ValueError, run_jobs, [a, b], 2, {}, {})
+
+
+class TracingTests(PipelineTestCase):
+
+    blueprints = {'slow': Slow}
+
+    config = """\
+[transmogrifier]
+trace = {trace:s}
+batch_size = {batch_size:s}
+pipeline =
+    source
+    slow
+    set
+    constructor
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i}} for i in range(20)]
+
+[slow]
+blueprint = transmogrifier.tests.slow
+condition = python:item['id'] == 7
+seconds = 0.05
+
+[set]
+blueprint = transmogrifier.set
+title = 'Item %d' % item['id']
+
+[constructor]
+blueprint = transmogrifier.to_jsonl
+filename = {filename:s}
+"""
+
+    def _run(self, trace, batch_size=''):
+        filename = os.path.join(self.layer.tempdir, 'output.jsonl')
+        transmogrifier = self._transmogrify(self._register(
+            '{0:s}.{1:s}'.format(trace or 'disabled',
+                                 batch_size or 'disabled'),
+            trace=trace, batch_size=batch_size, filename=filename))
+        with open(filename) as fp:
+            return transmogrifier.trace, fp.read()
+
+    def testSlowestItems(self):
+        trace, output = self._run('1')
+        slowest = trace['slowest'][0]
+        self.assertEqual(slowest['key'], 7)
+        self.assertGreaterEqual(slowest['total'], 0.05)
+        self.assertEqual(
+            max(slowest['latencies'], key=lambda pair: pair[1])[0], 'slow')
+
+    def testBatches(self):
+        # Latencies include the time items wait for their batch to fill
+        for batch_size in ['', '5']:
+            trace, output = self._run('1', batch_size)
+            self.assertEqual(trace['items'], 20)
+            self.assertEqual(
+                [(section['section'], section['samples'])
+                 for section in trace['sections']],
+                [('source', 20), ('slow', 20), ('set', 20),
+                 ('constructor', 20)])
+
+    def testItemsNotModified(self):
+        expected = self._run('')
+        self.assertIsNone(expected[0])
+        trace, output = self._run('3')
+        self.assertEqual(output, expected[1])
+        self.assertEqual(trace['sections'][0]['samples'], 6)
+
+
+class BenchTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def testBenchmarksCoverBlueprints(self):
+        from transmogrifier.bench import BENCHMARKS
+        from zope.component import getUtilitiesFor
+        for name, blueprint in getUtilitiesFor(ISectionBlueprint):
+            if name.startswith('transmogrifier.') and \
+                    not name.startswith('transmogrifier.tests'):
+                self.assertIn('blueprint.' + name[15:], BENCHMARKS)
+
+    def testRunSuite(self):
+        from transmogrifier.bench import BENCHMARKS
+        from transmogrifier.bench import run_suite
+        keys = []
+        results = run_suite(list(BENCHMARKS), sizes=[10], repeat=1,
+                            callback=lambda key, result: keys.append(key))
+        self.assertEqual(list(results['results']), keys)
+        self.assertEqual(len(keys), len(BENCHMARKS))
+        for result in results['results'].values():
+            self.assertGreater(result['items_per_second'], 0)
+
+        # Runs again with the configuration files of the new run
+        results = run_suite(['blueprint.from_csv'], sizes=[10], repeat=1)
+        self.assertEqual(list(results['results']), ['blueprint.from_csv@10'])
+
+    def testResetFingerprints(self):
+        from transmogrifier.bench import reset
+        from transmogrifier.bench import run_suite
+        from transmogrifier.blueprints.fingerprint import FingerprintFilter
+        checked = []
+        finish = FingerprintFilter.finish
+
+        def finish_(self_):
+            checked.append(self_.stats['checked'] - self_.stats['unchanged'])
+            finish(self_)
+        FingerprintFilter.finish = finish_
+        try:
+            run_suite(['blueprint.fingerprint'], sizes=[10], repeat=3)
+        finally:
+            FingerprintFilter.finish = finish
+        self.assertEqual(checked, [10, 10, 10])
+
+        path = os.path.join(self.layer.tempdir, 'fingerprints-10.db')
+        open(path, 'w').close()
+        reset('blueprint.fingerprint', 10, self.layer.tempdir)
+        self.assertFalse(os.path.exists(path))
+
+    def testCompare(self):
+        from transmogrifier.bench import compare
+        baseline = {'results': {'a@10': {'seconds': 1.0},
+                                'b@10': {'seconds': 1.0},
+                                'c@10': {'seconds': 1.0}}}
+        results = {'results': {'a@10': {'seconds': 1.05},
+                               'b@10': {'seconds': 1.2},
+                               'd@10': {'seconds': 1.0}}}
+        self.assertEqual(
+            [(key, regression) for key, expected, seconds, change, regression
+             in compare(results, baseline)],
+            [('a@10', False), ('b@10', True)])
+        self.assertEqual(
+            [(key, regression) for key, expected, seconds, change, regression
+             in compare(results, baseline, ['1', 'b=50'])],
+            [('a@10', True), ('b@10', False)])
+
+
+class ProfilerTests(PipelineTestCase):
+
+    blueprints = {'slow': Slow}
+
+    config = """\
+[transmogrifier]
+pipeline =
+    source
+    slow
+    set
+
+[source]
+blueprint = transmogrifier.from
+expression = [{{'id': i}} for i in range(10)]
+
+[slow]
+blueprint = transmogrifier.tests.slow
+
+[set]
+blueprint = transmogrifier.set
+title = 'Item %d' % item['id']
+"""
+
+    def testSamplesAttributedToSections(self):
+        from transmogrifier.profiler import SamplingProfiler
+        configuration_id = self._register('samples')
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        try:
+            self._transmogrify(configuration_id)
+        finally:
+            profiler.stop()
+
+        # Sleeping slow section is sampled as the innermost section
+        slow = [stack.split(';') for stack in profiler.samples
+                if stack.endswith(';slow (transmogrifier.tests.slow)')]
+        self.assertTrue(slow)
+        for stack in slow:
+            self.assertEqual(stack[1:], ['set (transmogrifier.set)',
+                                         'slow (transmogrifier.tests.slow)'])
+
+        fp = io.StringIO()
+        profiler.write(fp)
+        for line in fp.getvalue().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+
+
 def test_suite():
     import sys
     suite = unittest.findTestCases(sys.modules[__name__])
@@ -261,6 +1746,17 @@ def test_suite():
             '../../../docs/blueprints/breakpoint.rst',
             '../../../docs/blueprints/expression.rst',
             '../../../docs/blueprints/filter.rst',
+            '../../../docs/blueprints/csv.rst',
+            '../../../docs/blueprints/jsonl.rst',
+            '../../../docs/blueprints/generate.rst',
+            '../../../docs/blueprints/fingerprint.rst',
+            '../../../docs/blueprints/prefetch.rst',
+            '../../../docs/blueprints/parallel.rst',
+            '../../../docs/batch.rst',
+            '../../../docs/fusion.rst',
+            '../../../docs/stats.rst',
+            '../../../docs/checkpoint.rst',
+            '../../../docs/jobs.rst',
             setUp=TransmogrifierLayer.testSetUp,
             tearDown=TransmogrifierLayer.testTearDown,
             globs={'registerConfiguration':
@@ -269,4 +1765,17 @@ def test_suite():
                    'logger': InstalledHandler('logger', level=logging.DEBUG)},
             optionflags=doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS),
     ))
+    if sys.version_info >= (3, 6):
+        suite.addTests((
+            doctest.DocFileSuite(
+                '../../../docs/async.rst',
+                setUp=TransmogrifierLayer.testSetUp,
+                tearDown=TransmogrifierLayer.testTearDown,
+                globs={'registerConfiguration':
+                       TransmogrifierLayer.registerConfiguration,
+                       'Transmogrifier': Transmogrifier({}),
+                       'logger': InstalledHandler('logger',
+                                                  level=logging.DEBUG)},
+                optionflags=doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS),
+        ))
     return suite
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import heapq
+import logging
+
+from zope.interface import alsoProvides
+from zope.interface import implementer
+
+from transmogrifier.batch import is_batch_section
+from transmogrifier.expression import get_option
+from transmogrifier.interfaces import ISection
+from transmogrifier.interfaces import ISectionBatch
+from transmogrifier.stats import clock
+from transmogrifier.utils import get_words
+from transmogrifier.utils import is_mapping
+
+
+logger = logging.getLogger('transmogrifier')
+
+DEFAULT_TRACE_KEYS = '_path id'
+DEFAULT_TRACE_SLOWEST = 10
+
+
+def get_trace_rate(transmogrifier):
+    """Return N for tracing 1 in N items or 0 when tracing is disabled
+
+    Tracing is enabled with ``trace = N`` in the ``[transmogrifier]``
+    section. When disabled, sections are not wrapped at all.
+
+    """
+    return int(get_option(transmogrifier, 'trace') or 0)
+
+
+def get_tracer(transmogrifier):
+    """Return the tracer of the transmogrifier, created on the first call
+    """
+    if getattr(transmogrifier, 'tracer', None) is None:
+        transmogrifier.tracer = Tracer(
+            get_trace_rate(transmogrifier),
+            get_words(get_option(transmogrifier, 'trace_key',
+                                 DEFAULT_TRACE_KEYS)),
+            int(get_option(transmogrifier, 'trace_slowest',
+                           DEFAULT_TRACE_SLOWEST)))
+    return transmogrifier.tracer
+
+
+def percentile(values, p):
+    """Return the nearest-rank percentile of the sorted values"""
+    if not values:
+        return None
+    return values[max(int(round(p / 100.0 * len(values))) - 1, 0)]
+
+
+class Trace(object):
+    """Latencies of a sampled item through the sections"""
+
+    def __init__(self, item, start):
+        self.item = item  # kept to keep id(item) reserved
+        self.start = start
+        self.time = start
+        self.latencies = []
+
+    def record(self, name, now):
+        self.latencies.append((name, now - self.time))
+        self.time = now
+
+
+class Tracer(object):
+    """Trace 1 in ``rate`` new items through the pipeline sections
+
+    Sampled items are not tagged, but tracked by their identity. A trace
+    ends when the item is yielded by the last section of the pipeline (or at
+    the end of the run, when the item was dropped before that). Sections
+    replacing items with new objects, therefore, end their traces.
+
+    """
+
+    def __init__(self, rate, keys=(), slowest=DEFAULT_TRACE_SLOWEST):
+        self.rate = rate
+        self.keys = keys
+        self.slowest = slowest
+        self.new = 0
+        self.active = {}
+        self.latencies = {}
+        self.sections = []
+        self.completed = 0
+        self.heap = []
+
+    def add_section(self, name):
+        if name not in self.latencies:
+            self.sections.append(name)
+            self.latencies[name] = []
+
+    def sample(self, item, start):
+        self.new += 1
+        if self.new % self.rate:
+            return None
+        trace = self.active[id(item)] = Trace(item, start)
+        return trace
+
+    def record(self, trace, name, now):
+        trace.record(name, now)
+        self.latencies[name].append(trace.latencies[-1][1])
+
+    def finish(self, item):
+        trace = self.active.pop(id(item), None)
+        if trace is None:
+            return
+        self.completed += 1
+        entry = (trace.time - trace.start, self.completed,
+                 self.get_key(item), trace.latencies)
+        if len(self.heap) < self.slowest:
+            heapq.heappush(self.heap, entry)
+        elif self.slowest:
+            heapq.heappushpop(self.heap, entry)
+
+    def get_key(self, item):
+        if is_mapping(item):
+            for key in self.keys:
+                if key in item:
+                    return item[key]
+        return None
+
+    def get_report(self):
+        for trace in list(self.active.values()):
+            self.finish(trace.item)
+        sections = []
+        for name in self.sections:
+            values = sorted(self.latencies[name])
+            sections.append({
+                'section': name,
+                'samples': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': values[-1] if values else None,
+            })
+        return {
+            'rate': self.rate,
+            'items': self.completed,
+            'sections': sections,
+            'slowest': [{'key': key, 'total': total,
+                         'latencies': latencies}
+                        for total, i, key, latencies
+                        in sorted(self.heap, reverse=True)],
+        }
+
+
+def format_ms(value):
+    return '-' if value is None else '{0:.2f}'.format(value * 1000)
+
+
+def format_report(report):
+    """Return the latencies as a table with a row for each traced section
+    and a row for each of the slowest items
+    """
+    width = max([len(s['section']) for s in report['sections']] + [7])
+    row = '{0:' + str(width) + 's} {1:>8s} {2:>9s} {3:>9s} {4:>9s} {5:>9s}'
+    lines = [row.format('section', 'samples', 'p50 (ms)', 'p95 (ms)',
+                        'p99 (ms)', 'max (ms)')]
+    for s in report['sections']:
+        lines.append(row.format(
+            s['section'], '{0:d}'.format(s['samples']), format_ms(s['p50']),
+            format_ms(s['p95']), format_ms(s['p99']), format_ms(s['max'])))
+    if report['slowest']:
+        lines.append('')
+        lines.append('slowest items:')
+    for entry in report['slowest']:
+        name, latency = max(entry['latencies'], key=lambda pair: pair[1])
+        lines.append('  {0!s}: {1:s} ms (slowest in {2:s}: {3:s} ms)'.format(
+            entry['key'], format_ms(entry['total']), name,
+            format_ms(latency)))
+    return '\n'.join(lines)
+
+
+def log_report(pipeline, report):
+    logger.info('{0:s} item latencies (1 in {1:d} items):\n{2:s}'.format(
+        pipeline or 'pipeline', report['rate'], format_report(report)))
+
+
+@implementer(ISection)
+class TraceIterator(object):
+    """Record the time when the section yields sampled items
+
+    New items are sampled when the section has yielded more items than its
+    previous section, i.e. when it is yielding items of its own.
+
+    """
+
+    def __init__(self, section, name, tracer, previous=None, last=False):
+        self.section = section
+        self.name = name
+        self.tracer = tracer
+        self.previous = (isinstance(previous, TraceIterator) and previous
+                         or None)
+        self.last = last
+        self.items = 0
+        self.iterator = iter(section)
+        tracer.add_section(name)
+        if is_batch_section(section):
+            alsoProvides(self, ISectionBatch)
+
+    def __iter__(self):
+        return self
+
+    def trace(self, item, start, now):
+        tracer = self.tracer
+        trace = tracer.active.get(id(item))
+        if trace is None and (self.previous is None or
+                              self.items > self.previous.items):
+            trace = tracer.sample(item, start)
+        if trace is not None:
+            tracer.record(trace, self.name, now)
+            if self.last:
+                tracer.finish(item)
+
+    def __next__(self):
+        start = clock()
+        item = next(self.iterator)
+        self.items += 1
+        self.trace(item, start, clock())
+        return item
+
+    next = __next__  # Python 2
+
+    def iter_batches(self):
+        batches = iter(self.section.iter_batches())
+        while True:
+            start = clock()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                break
+            now = clock()
+            for item in batch:
+                self.items += 1
+                self.trace(item, start, now)
+            yield batch
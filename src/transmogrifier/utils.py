@@ -12,6 +12,8 @@ from configparser import RawConfigParser
 from zope.interface.common.mapping import IMapping
 from zope.interface.exceptions import BrokenImplementation
 from zope.interface.verify import verifyObject
+from transmogrifier.interfaces import IAsyncSection
+from transmogrifier.interfaces import IFusableSection
 from transmogrifier.interfaces import ISection
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.registry import configuration_registry
@@ -26,6 +28,8 @@ def pformat_msg(obj):
 def is_mapping(item):
     """Validate that item can acts as a mapping
     """
+    if type(item) is dict:
+        return True  # skip the slow verification for the common case
     try:
         verifyObject(IMapping, item, tentative=True)
     except BrokenImplementation as e:
@@ -47,6 +51,16 @@ def get_lines(value):
                                  (value or '').splitlines())))
 
 
+def get_bool(value, default=False):
+    """Return boolean for true/false, yes/no, on/off or 1/0 option value"""
+    value = (value or '').strip().lower()
+    if value in ('true', 'yes', 'on', '1'):
+        return True
+    elif value in ('false', 'no', 'off', '0'):
+        return False
+    return default
+
+
 def resolvePackageReference(reference):
     """Given a package:filename reference, return the filesystem path
 
@@ -59,26 +73,162 @@ def resolvePackageReference(reference):
     return os.path.join(os.path.dirname(package.__file__), filename)
 
 
+def get_section(transmogrifier, section, blueprint_id, section_id,
+                fused=False):
+    """Return the section as a synchronous iterable
+
+    Asynchronous sections are adapted into iterators, which run them in the
+    event loop of the transmogrifier. Batch sections are adapted into
+    iterators, which pass their batches to the next batch section, when
+    batching is enabled and the section is not going to be fused.
+
+    """
+    if IAsyncSection.providedBy(section):
+        from transmogrifier.aio import SyncIterator
+        from transmogrifier.aio import get_event_loop
+        return SyncIterator(section, get_event_loop(transmogrifier))
+    elif not ISection.providedBy(section):
+        raise ValueError('Blueprint %s for section %s did not return '
+                         'an ISection' % (blueprint_id, section_id))
+    elif not fused:
+        from transmogrifier.batch import BatchIterator
+        from transmogrifier.batch import get_batch_size
+        from transmogrifier.batch import is_batch_section
+        if is_batch_section(section) and get_batch_size(transmogrifier) > 1:
+            return BatchIterator(section)
+    return section
+
+
+def overrides_iter(class_, name):
+    """Test if __iter__ of the class is overridden after the class defining
+    the named method, e.g. in a subclass of a built-in blueprint, so that the
+    method no longer processes items like __iter__ does
+    """
+    for base in getattr(class_, '__mro__', ()):
+        if name in vars(base):
+            return class_.__iter__ != base.__iter__
+    return False
+
+
+def is_fusable(blueprint):
+    try:
+        return (IFusableSection.implementedBy(blueprint) and
+                not overrides_iter(blueprint, 'get_code'))
+    except TypeError:  # blueprint is not a class or a factory
+        return False
+
+
+def flatten_pipeline(transmogrifier, sections, parents=()):
+    """Yield (section_id, blueprint_id, blueprint) for the pipeline sections
+
+    Nested ``transmogrifier.pipeline`` sections are spliced into the
+    pipeline, so that their sub-pipelines are constructed directly into the
+    parent pipeline instead of passing all items through an extra section.
+
+    """
+    from transmogrifier.blueprints.pipeline import Pipeline
+    for section_id in sections:
+        blueprint_id = transmogrifier[section_id]['blueprint']
+        blueprint = getUtility(ISectionBlueprint, blueprint_id)
+        if blueprint is not Pipeline:
+            yield section_id, blueprint_id, blueprint
+            continue
+
+        options = transmogrifier[section_id]
+        assert not options.get('condition'), \
+            'Support for conditional pipelines has been removed'
+        assert section_id not in parents, \
+            'Recursive pipeline: {0:s}'.format(section_id)
+        for entry in flatten_pipeline(
+                transmogrifier,
+                [sub_section_id for sub_section_id
+                 in get_lines(options.get('pipeline') or '')
+                 if sub_section_id != section_id],
+                parents + (section_id,)):
+            yield entry
+
+
+def plan_pipeline(transmogrifier, sections):
+    """Plan a transmogrifier pipeline
+
+    ``sections`` is a list of pipeline section ids. Return a list of
+    groups of (section_id, blueprint_id, blueprint) tuples, where each group
+    of more than one section is constructed as a single fused section.
+    Nested pipeline sections are replaced with their sub-pipelines.
+
+    """
+    from transmogrifier.fusion import get_fusion
+    fusion = get_fusion(transmogrifier)
+
+    plan = []
+    fusable = False
+    for section_id, blueprint_id, blueprint in flatten_pipeline(
+            transmogrifier, sections):
+        if fusable and fusion and is_fusable(blueprint):
+            plan[-1].append((section_id, blueprint_id, blueprint))
+        else:
+            plan.append([(section_id, blueprint_id, blueprint)])
+        fusable = is_fusable(blueprint)
+    return plan
+
+
 def constructPipeline(transmogrifier, sections, pipeline=None):
     """Construct a transmogrifier pipeline
 
     ``sections`` is a list of pipeline section ids. Start the pipeline with
     ``pipeline``, or if that's None, with an empty iterator.
 
+    When statistics are enabled, each constructed section is wrapped with
+    a meter, which is appended into ``meters`` of the transmogrifier. When
+    tracing is enabled, each constructed section is wrapped with an iterator
+    recording the latencies of the sampled items into ``tracer`` of the
+    transmogrifier.
+
     """
+    from transmogrifier.stats import get_stats
+    from transmogrifier.tracing import get_trace_rate
+    stats = get_stats(transmogrifier)
+    trace = get_trace_rate(transmogrifier)
+    traced = None
+
     if pipeline is None:
         pipeline = iter(())  # empty starter section
-
-    for section_id in sections:
-        section_options = transmogrifier[section_id]
-        blueprint_id = section_options['blueprint']
-        blueprint = getUtility(ISectionBlueprint, blueprint_id)
-        pipeline = blueprint(transmogrifier, section_id,
-                             section_options, pipeline)
-        if not ISection.providedBy(pipeline):
-            raise ValueError('Blueprint %s for section %s did not return '
-                             'an ISection' % (blueprint_id, section_id))
-        pipeline = iter(pipeline)  # ensure you can call .next()
+        outermost = True
+    else:
+        outermost = False
+
+    for group in plan_pipeline(transmogrifier, sections):
+        fused = []
+        conditions = []
+        for section_id, blueprint_id, blueprint in group:
+            section = blueprint(transmogrifier, section_id,
+                                transmogrifier[section_id], pipeline)
+            if stats:
+                from transmogrifier.stats import meter_conditions
+                conditions.extend(meter_conditions(section))
+            section = get_section(transmogrifier, section, blueprint_id,
+                                  section_id, len(group) > 1)
+            fused.append(section)
+        if len(fused) > 1:
+            from transmogrifier.fusion import FusedSection
+            section = get_section(
+                transmogrifier, FusedSection(transmogrifier, fused, pipeline),
+                None, None)
+        name = '+'.join([entry[0] for entry in group])
+        if trace:
+            from transmogrifier.tracing import TraceIterator
+            from transmogrifier.tracing import get_tracer
+            section = traced = TraceIterator(
+                section, name, get_tracer(transmogrifier), traced)
+        if stats:
+            from transmogrifier.stats import SectionMeter
+            pipeline = SectionMeter(section, name, pipeline, conditions)
+            transmogrifier.meters.append(pipeline)
+        else:
+            pipeline = iter(section)  # ensure .next()
+
+    if traced is not None and outermost:
+        traced.last = True  # end traces of the items leaving the pipeline
 
     return pipeline
 